@@ -1,12 +1,16 @@
 # app.py - Application Flask SaaS Multi-Agences Odyssée
 import os
 import json
+import atexit
+import hashlib
+import queue
 import requests
 import logging
 from datetime import datetime, date, timedelta
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, g, abort, make_response
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, g, abort, make_response
 from flask_migrate import Migrate
 from flask_mail import Mail
 from flask_limiter import Limiter
@@ -16,16 +20,22 @@ from flask_session import Session # NOUVEAU
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
+from jinja2 import FileSystemBytecodeCache
 from dotenv import load_dotenv
 from weasyprint import HTML
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pydantic import ValidationError
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import select, update, insert, or_, and_, case, cast, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload, defer
 
 # Import des modèles et configuration
-from models import db, Agency, User, Client, Trip, Invoice, TripNote, ActivityLog
+from models import db, Agency, User, Client, Trip, Invoice, TripNote, ActivityLog, json_loads, json_dumps, utcnow
 from config import get_config
-from utils.crypto import init_crypto, decrypt_config, decrypt_api_key
+from utils.crypto import init_crypto, decrypt_agency_bundle
+from utils.cache import init_cache, get_cache
+from utils.json_provider import get_json_provider_class
 
 # ==============================================================================
 # IMPORTS DES SCHÉMAS DE VALIDATION
@@ -36,7 +46,7 @@ try:
     from services.mailer import send_manual_payment_email
     from services.payment import create_stripe_payment_link
     from services.publication import publish_via_ftp
-    from services.template_engine import render_trip_template
+    from services.template_engine import render_trip_template, render_trip_template_stream
     from services.ai_assistant import parse_prompt, generate_program
     from services.api_gatherer import gather_trip_data
     SERVICES_AVAILABLE = True
@@ -63,9 +73,21 @@ def create_app():
     
     app = Flask(__name__)
     
+    # jsonify encodé par orjson quand il est disponible
+    json_provider_class = get_json_provider_class()
+    if json_provider_class is not None:
+        app.json = json_provider_class(app)
+    
     # Charger la configuration
     app.config.from_object(get_config())
     
+    # Cache des templates Jinja2 (à configurer avant la première utilisation de app.jinja_env)
+    app.jinja_options = {**app.jinja_options, 'cache_size': app.config['JINJA_CACHE_SIZE']}
+    bytecode_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if bytecode_dir:
+        os.makedirs(bytecode_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+    
     # Initialiser Flask-Session (doit être fait AVANT les autres extensions qui utilisent la session)
     Session(app)
     
@@ -93,6 +115,22 @@ def create_app():
     # Initialiser le système de chiffrement
     init_crypto(app.config['MASTER_ENCRYPTION_KEY'])
     
+    # Initialiser le cache (Redis si REDIS_URL est défini, mémoire sinon)
+    init_cache(app.config.get('REDIS_URL'))
+    
+    # Exécuteur pour les tâches lentes sans impact sur la réponse (emails...)
+    background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='odyssee-bg')
+    
+    def run_in_background(func, *args, **kwargs):
+        """Exécute `func` hors du thread de requête, dans un contexte applicatif."""
+        def _task():
+            with app.app_context():
+                try:
+                    func(*args, **kwargs)
+                except Exception as e:
+                    app.logger.warning(f"Tâche en arrière-plan {func.__name__} échouée : {e}", exc_info=True)
+        return background_executor.submit(_task)
+    
     # ==============================================================================
     # FILTRES JINJA2 PERSONNALISÉS
     # ==============================================================================
@@ -161,15 +199,46 @@ def create_app():
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
         ))
         file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
+
+        # Écriture du fichier dans un thread dédié : les requêtes ne bloquent pas sur les I/O de log.
+        # Les services (mailer, paiement, publication, IA...) loggent dans le même fichier.
+        log_queue = queue.Queue(-1)
+        queue_handler = QueueHandler(log_queue)
+        log_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        log_listener.start()
+        atexit.register(log_listener.stop)
+        app.logger.addHandler(queue_handler)
+        for name in ('services', 'utils'):
+            logging.getLogger(name).addHandler(queue_handler)
 
     app.logger.setLevel(logging.INFO)
+    for name in ('services', 'utils'):
+        logging.getLogger(name).setLevel(logging.INFO)
     app.logger.info('🚀 Démarrage de l\'application Odyssée')
     
     # ==============================================================================
     # MIDDLEWARE - IDENTIFICATION DE L'AGENCE
     # ==============================================================================
     
+    # Configs déchiffrées par agence : agency.id -> (updated_at, config).
+    # Une seule version par agence, remplacée par une simple affectation (pas de
+    # parcours du dictionnaire, partagé entre threads). Volontairement gardé en
+    # mémoire du processus : les secrets en clair ne doivent pas transiter par Redis.
+    _agency_config_cache = {}
+    
+    def load_agency_config(agency):
+        """Retourne la configuration déchiffrée d'une agence (mise en cache jusqu'à sa prochaine modification)."""
+        cached = _agency_config_cache.get(agency.id)
+        if cached is not None and cached[0] == agency.updated_at:
+            return cached[1]
+        
+        config = {
+            **decrypt_agency_bundle(agency),
+            'youtube_api_key': app.config.get('YOUTUBE_API_KEY')  # Clé YouTube globale si disponible
+        }
+        _agency_config_cache[agency.id] = (agency.updated_at, config)
+        return config
+    
     @app.before_request
     def identify_agency():
         """
@@ -206,13 +275,7 @@ def create_app():
         
         # Déchiffrer et stocker les configs de l'agence si elle existe
         if agency:
-            g.agency_config = {
-                'google_api_key': decrypt_api_key(agency.google_api_key_encrypted) if agency.google_api_key_encrypted else None,
-                'stripe_api_key': decrypt_api_key(agency.stripe_api_key_encrypted) if agency.stripe_api_key_encrypted else None,
-                'mail_config': decrypt_config(agency.mail_config_encrypted) if agency.mail_config_encrypted else {},
-                'ftp_config': decrypt_config(agency.ftp_config_encrypted) if agency.ftp_config_encrypted else {},
-                'youtube_api_key': app.config.get('YOUTUBE_API_KEY')  # Clé YouTube globale si disponible
-            }
+            g.agency_config = load_agency_config(agency)
     
     # ==============================================================================
     # DÉCORATEURS D'AUTHENTIFICATION
@@ -273,6 +336,33 @@ def create_app():
             return f(*args, **kwargs)
         return decorated_function
     
+    def load_authorized_trip(trip_id, require_owner=True, light=False):
+        """
+        Charge un voyage de l'agence courante en une seule requête, droits inclus.
+        
+        Args:
+            trip_id: ID du voyage
+            require_owner: Si True, un vendeur ne peut accéder qu'à ses propres voyages
+            light: Si True, ne charge que les colonnes de contrôle (voir Trip.load_light)
+        
+        Returns:
+            Trip (ou Row si light=True). Abort 404 si absent ou non autorisé.
+        """
+        criteria = [Trip.agency_id == g.agency.id]
+        if require_owner and g.user.role == 'seller':
+            criteria.append(Trip.user_id == g.user.id)
+        
+        if light:
+            trip = Trip.load_light(trip_id, *criteria)
+        else:
+            trip = db.session.execute(
+                select(Trip).where(Trip.id == trip_id, *criteria)
+            ).scalar_one_or_none()
+        
+        if trip is None:
+            abort(404)
+        return trip
+    
     # ==============================================================================
     # FONCTIONS HELPER POUR LES QUOTAS
     # ==============================================================================
@@ -280,36 +370,48 @@ def create_app():
     def check_and_increment_quota(user_id, agency_id):
         """
         Vérifie et incrémente les quotas de manière atomique pour éviter les race conditions.
-        Utilise un verrou `FOR UPDATE` sur les lignes utilisateur et agence.
+        Chaque compteur est mis à jour par un seul UPDATE conditionnel (remise à zéro,
+        vérification de la limite et incrément faits par la base) : pas de SELECT préalable.
         
         Returns:
             (bool, str): (True, "OK") si le quota est bon, (False, "message d'erreur") sinon.
         """
         try:
-            # Verrouiller les lignes pour la mise à jour afin d'éviter les race conditions
-            user = db.session.query(User).filter_by(id=user_id).with_for_update().one()
-            agency = db.session.query(Agency).filter_by(id=agency_id).with_for_update().one()
-
             today = date.today()
-
-            # 1. Réinitialiser les compteurs si nécessaire
-            if user.last_generation_date != today:
-                user.generation_count = 0
-                user.last_generation_date = today
-
-            if agency.usage_reset_date < today:
-                agency.current_month_usage = 0
-                agency.usage_reset_date = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
-
-            # 2. Vérifier les quotas
-            if user.generation_count >= user.daily_generation_limit:
+            next_reset = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+            # 1. Quota quotidien du vendeur (compteur remis à zéro au changement de jour)
+            user_reset = or_(User.last_generation_date.is_(None), User.last_generation_date != today)
+            user_count = case((user_reset, 0), else_=User.generation_count)
+            result = db.session.execute(
+                update(User)
+                .where(User.id == user_id, user_count < User.daily_generation_limit)
+                .values(generation_count=user_count + 1, last_generation_date=today),
+                execution_options={'synchronize_session': False}
+            )
+            if result.rowcount == 0:
+                db.session.rollback()
                 return False, "Votre quota de génération quotidien est atteint."
-            if agency.current_month_usage >= agency.monthly_generation_limit:
-                return False, "Le quota de génération mensuel de l'agence est atteint."
 
-            # 3. Incrémenter les compteurs
-            user.generation_count += 1
-            agency.current_month_usage += 1
+            # 2. Quota mensuel de l'agence
+            agency_reset = or_(Agency.usage_reset_date.is_(None), Agency.usage_reset_date < today)
+            agency_usage = case((agency_reset, 0), else_=Agency.current_month_usage)
+            result = db.session.execute(
+                update(Agency)
+                .where(Agency.id == agency_id, agency_usage < Agency.monthly_generation_limit)
+                .values(
+                    current_month_usage=agency_usage + 1,
+                    usage_reset_date=case((agency_reset, next_reset), else_=Agency.usage_reset_date),
+                    # Le compteur ne modifie pas la configuration : updated_at (clé des
+                    # caches de config et de rendu) est conservé
+                    updated_at=Agency.updated_at
+                ),
+                execution_options={'synchronize_session': False}
+            )
+            if result.rowcount == 0:
+                # Annule aussi l'incrément du vendeur
+                db.session.rollback()
+                return False, "Le quota de génération mensuel de l'agence est atteint."
             
             db.session.commit()
             return True, "OK"
@@ -319,6 +421,58 @@ def create_app():
             app.logger.error(f"Erreur lors de la vérification du quota : {e}", exc_info=True)
             return False, "Erreur serveur lors de la vérification du quota."
 
+    def render_trip_html(trip):
+        """
+        Rend la fiche HTML d'un voyage, avec mise en cache.
+        
+        La clé dépend du contenu du voyage et de la version de l'agence :
+        toute modification produit une nouvelle clé, sans invalidation explicite.
+        """
+        template_type = 'day_trip' if trip.is_day_trip else 'standard'
+        digest = hashlib.sha1(
+            f"{json_dumps(trip.full_data_json)}|{template_type}|{g.agency.template_name}|{g.agency.updated_at}".encode('utf-8')
+        ).hexdigest()
+        cache_key = f"trip_html:{g.agency.id}:{trip.id}:{digest}"
+        
+        cache = get_cache()
+        html_content = cache.get(cache_key)
+        if html_content is None:
+            html_content = render_trip_template(
+                data=trip.full_data_json,
+                template_type=template_type,
+                agency_style=g.agency.template_name,
+                agency_config=g.agency.to_dict()
+            )
+            cache.set(cache_key, html_content, ttl=3600)
+        return html_content
+    
+    def trip_to_dict_cached(trip):
+        """
+        Retourne trip.to_dict() en réutilisant la partie propre au voyage tant qu'il n'a pas changé.
+        
+        Seul own_dict() est mis en cache, sous updated_at (mis à jour à chaque écriture, vente
+        comprise), ce qui évite de redécoder full_data_json. Vendeur, client et factures sont
+        fusionnés à la lecture : leurs modifications ne touchent pas updated_at du voyage.
+        """
+        if trip.updated_at is None:
+            return trip.to_dict()
+        
+        cache = get_cache()
+        cache_key = f"trip_dict:{trip.id}:{trip.updated_at.isoformat()}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            own_dict = json_loads(cached)
+        else:
+            own_dict = trip.own_dict()
+            cache.set(cache_key, json_dumps(own_dict), ttl=3600)
+        return {**own_dict, **trip.related_dict()}
+    
+    def not_modified(etag):
+        """Réponse 304 (le client a déjà la version identifiée par `etag`)."""
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
     def calculate_duration_minutes(data):
         """
         Calcule la durée de trajet en minutes depuis les données du formulaire
@@ -334,18 +488,52 @@ def create_app():
         minutes = int(form_data.get('travel_minutes', 0))
         return (hours * 60) + minutes
     
+    def normalize_trip_date(value):
+        """
+        Normalise une date du formulaire pour les colonnes date_start/date_end (String(20))
+        
+        Args:
+            value: Date saisie (AAAA-MM-JJ, éventuellement suivie d'une heure, ou JJ/MM/AAAA)
+            
+        Returns:
+            str: Date ISO AAAA-MM-JJ, ou None si absente ou invalide
+        """
+        if not value or not isinstance(value, str):
+            return None
+        value = value.strip()
+        try:
+            return date.fromisoformat(value[:10]).isoformat()
+        except ValueError:
+            pass
+        try:
+            return datetime.strptime(value, '%d/%m/%Y').date().isoformat()
+        except ValueError:
+            return None
+    
     # NOUVEAU : Helper pour logger les activités
     def log_activity(action: str, user_id: int, agency_id: int, trip_id: int = None, details: str = None):
-        """Enregistre une activité dans le journal de l'agence."""
+        """
+        Enregistre une activité dans le journal de l'agence.
+        L'écriture est différée : les entrées sont insérées en un seul lot en fin de requête.
+        """
+        if '_pending_logs' not in g:
+            g._pending_logs = []
+        g._pending_logs.append({
+            'action': action,
+            'user_id': user_id,
+            'agency_id': agency_id,
+            'trip_id': trip_id,
+            'details': details
+        })
+    
+    @app.teardown_request
+    def flush_activity_logs(exc):
+        """Insère en une fois (executemany) les activités journalisées pendant la requête."""
+        pending_logs = g.pop('_pending_logs', None)
+        if not pending_logs or exc is not None:
+            return
         try:
-            activity = ActivityLog(
-                action=action,
-                user_id=user_id,
-                agency_id=agency_id,
-                trip_id=trip_id,
-                details=details
-            )
-            db.session.add(activity)
+            db.session.execute(insert(ActivityLog), pending_logs)
             db.session.commit()
         except Exception as e:
             app.logger.error(f"Erreur lors de la journalisation de l'activité: {e}", exc_info=True)
@@ -525,8 +713,8 @@ def create_app():
             # Créer une nouvelle agence
             try:
                 # 1. Valider les données d'entrée avec Pydantic
-                validated_data = AgencyCreateSchema(**request.get_json())
-                data = validated_data.dict() # Convertir en dictionnaire
+                validated_data = AgencyCreateSchema.model_validate(request.get_json())
+                data = validated_data.model_dump() # Convertir en dictionnaire
 
                 # 2. Vérifier les contraintes métier (unicité)
                 existing = Agency.query.filter_by(subdomain=data['subdomain']).first()
@@ -575,7 +763,7 @@ def create_app():
                 
             except ValidationError as e:
                 # Erreur de validation Pydantic
-                return jsonify({'success': False, 'message': 'Données invalides', 'errors': e.errors()}), 400
+                return jsonify({'success': False, 'message': 'Données invalides', 'errors': e.errors(include_url=False, include_context=False)}), 400
             except Exception as e:
                 db.session.rollback()
                 app.logger.error(f"Erreur lors de la création d'agence: {e}", exc_info=True)
@@ -595,9 +783,9 @@ def create_app():
             # Modifier l'agence
             try:
                 # 1. Valider les données d'entrée avec Pydantic
-                validated_data = AgencyUpdateSchema(**request.get_json())
+                validated_data = AgencyUpdateSchema.model_validate(request.get_json())
                 # Obtenir uniquement les champs qui ont été fournis dans la requête
-                update_data = validated_data.dict(exclude_unset=True)
+                update_data = validated_data.model_dump(exclude_unset=True)
 
                 # 2. Appliquer les mises à jour
                 from utils.crypto import encrypt_api_key, encrypt_config
@@ -634,7 +822,7 @@ def create_app():
                 })
                 
             except ValidationError as e:
-                return jsonify({'success': False, 'message': 'Données invalides', 'errors': e.errors()}), 400
+                return jsonify({'success': False, 'message': 'Données invalides', 'errors': e.errors(include_url=False, include_context=False)}), 400
             except Exception as e:
                 db.session.rollback()
                 app.logger.error(f"Erreur lors de la mise à jour de l'agence {agency_id}: {e}", exc_info=True)
@@ -698,8 +886,8 @@ def create_app():
             
             try:
                 # 1. Valider les données
-                validated_data = UserCreateSchema(**request.get_json())
-                data = validated_data.dict()
+                validated_data = UserCreateSchema.model_validate(request.get_json())
+                data = validated_data.model_dump()
 
                 # 2. Vérifier les contraintes d'unicité
                 if User.query.filter_by(username=data['username']).first():
@@ -734,7 +922,7 @@ def create_app():
                 })
                 
             except ValidationError as e:
-                return jsonify({'success': False, 'message': 'Données invalides', 'errors': e.errors()}), 400
+                return jsonify({'success': False, 'message': 'Données invalides', 'errors': e.errors(include_url=False, include_context=False)}), 400
             except Exception as e:
                 db.session.rollback()
                 app.logger.error(f"Erreur lors de la création de l'utilisateur pour l'agence {agency_id}: {e}", exc_info=True)
@@ -757,8 +945,8 @@ def create_app():
             # Modifier l'utilisateur
             try:
                 # 1. Valider les données
-                validated_data = UserUpdateSchema(**request.get_json())
-                update_data = validated_data.dict(exclude_unset=True)
+                validated_data = UserUpdateSchema.model_validate(request.get_json())
+                update_data = validated_data.model_dump(exclude_unset=True)
 
                 # 2. Appliquer les mises à jour
                 for key, value in update_data.items():
@@ -786,7 +974,7 @@ def create_app():
                 
 
             except ValidationError as e:
-                return jsonify({'success': False, 'message': 'Données invalides', 'errors': e.errors()}), 400
+                return jsonify({'success': False, 'message': 'Données invalides', 'errors': e.errors(include_url=False, include_context=False)}), 400
             except Exception as e:
                 db.session.rollback()
                 app.logger.error(f"Erreur lors de la mise à jour de l'utilisateur {user_id}: {e}", exc_info=True)
@@ -872,10 +1060,10 @@ def create_app():
         
         # Récupérer les dernières activités
         if g.user.role == 'agency_admin':
-            activities = ActivityLog.query.filter_by(agency_id=g.agency.id).order_by(ActivityLog.created_at.desc()).limit(10).all()
+            activities = ActivityLog.query.options(joinedload(ActivityLog.user)).filter_by(agency_id=g.agency.id).order_by(ActivityLog.created_at.desc()).limit(10).all()
         else:
             # Le vendeur ne voit que ses activités
-            activities = ActivityLog.query.filter_by(user_id=g.user.id).order_by(ActivityLog.created_at.desc()).limit(10).all()
+            activities = ActivityLog.query.options(joinedload(ActivityLog.user)).filter_by(user_id=g.user.id).order_by(ActivityLog.created_at.desc()).limit(10).all()
 
 
         stats = {
@@ -985,8 +1173,8 @@ def create_app():
         if g.user.role == 'seller' and trip.user_id != g.user.id:
             abort(403, "Vous n'avez pas la permission de voir ce voyage.")
 
-        # Charger les données JSON pour un affichage complet
-        full_data = json.loads(trip.full_data_json)
+        # Données JSON complètes (déjà décodées par la colonne JSON)
+        full_data = trip.full_data_json
         return render_template('agency/trip_detail.html', trip=trip, full_data=full_data)
 
     # NOUVEAU : Page pour modifier un voyage
@@ -1006,7 +1194,7 @@ def create_app():
         if trip.status == 'sold':
             return render_template('error.html', message="Impossible de modifier un voyage qui a été vendu.")
 
-        full_data = json.loads(trip.full_data_json)
+        full_data = trip.full_data_json
         return render_template('agency/edit_trip.html', trip=trip, full_data=full_data)
 
     # NOUVEAU : Route pour générer le PDF de la fiche de présentation du voyage
@@ -1024,19 +1212,8 @@ def create_app():
         if g.user.role == 'seller' and trip.user_id != g.user.id:
             abort(403, "Vous n'avez pas la permission de voir ce voyage.")
 
-        # Charger les données complètes du voyage
-        full_data = json.loads(trip.full_data_json)
-        
-        # Déterminer le type de template
-        template_type = 'day_trip' if trip.is_day_trip else 'standard'
-        
         # Rendre le template HTML de la fiche de voyage
-        html_string = render_trip_template(
-            data=full_data,
-            template_type=template_type,
-            agency_style=g.agency.template_name,
-            agency_config=g.agency.to_dict()
-        )
+        html_string = render_trip_html(trip)
 
         pdf = HTML(string=html_string).write_pdf()
         response = make_response(pdf)
@@ -1451,15 +1628,27 @@ def create_app():
             # Déterminer le type de template
             template_type = 'day_trip' if data.get('form_data', {}).get('is_day_trip') else 'standard'
             
-            # Générer le HTML avec le template engine
-            html = render_trip_template(
+            # Générer le HTML avec le template engine, envoyé au fil du rendu
+            html_stream = render_trip_template_stream(
                 data,
                 template_type,
                 g.agency.template_name,
                 g.agency.to_dict()
             )
             
-            return make_response(html)
+            # Le rendu est paresseux : le premier bloc (~64 Ko, souvent toute la fiche) est produit
+            # ici pour qu'une erreur de template passe par le except ci-dessous (page 500)
+            first_block = next(html_stream, '')
+            
+            def stream_remaining_blocks():
+                yield first_block
+                try:
+                    yield from html_stream
+                except Exception as e:
+                    # Réponse déjà commencée (200) : on ne peut plus que journaliser
+                    app.logger.error(f"Erreur Render HTML (en cours d'envoi): {e}", exc_info=True)
+            
+            return Response(stream_remaining_blocks(), mimetype='text/html')
             
         except Exception as e:
             app.logger.error(f"Erreur Render HTML: {e}", exc_info=True)
@@ -1478,39 +1667,78 @@ def create_app():
         """
         
         if request.method == 'GET':
-            page = request.args.get('page', 1, type=int)
             per_page = 20
+            cursor = request.args.get('cursor')
 
             # Liste des voyages selon le rôle
-            if g.user.role == 'agency_admin':
-                query = Trip.query.options(
-                    joinedload(Trip.user)
-                ).filter_by(agency_id=g.agency.id)
-            else:
-                query = Trip.query.options(
-                    joinedload(Trip.user)
-                ).filter_by(agency_id=g.agency.id, user_id=g.user.id)
+            criteria = [Trip.agency_id == g.agency.id]
+            if g.user.role != 'agency_admin':
+                criteria.append(Trip.user_id == g.user.id)
             
-            pagination = query.order_by(Trip.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-            trips = pagination.items
+            # Rien n'a changé depuis le dernier appel du client : 304 sans sérialisation.
+            # Vendeur et client sont inclus (pseudo, nom, e-mail... figurent dans la liste).
+            last_update, last_client_update, last_user_update, trip_count = db.session.execute(
+                select(
+                    func.max(Trip.updated_at),
+                    func.max(Client.updated_at),
+                    func.max(User.updated_at),
+                    func.count(Trip.id)
+                )
+                .select_from(Trip)
+                .outerjoin(Client, Trip.client_id == Client.id)
+                .outerjoin(User, Trip.user_id == User.id)
+                .where(*criteria)
+            ).one()
+            etag = f"trips-{last_update}-{last_client_update}-{last_user_update}-{trip_count}-{cursor or ''}"
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
             
-            return jsonify({
+            # full_data_json n'est chargé qu'en cas d'absence dans le cache de sérialisation
+            query = Trip.query.options(
+                joinedload(Trip.user),
+                joinedload(Trip.client),
+                selectinload(Trip.invoices),
+                defer(Trip.full_data_json)
+            ).filter(*criteria)
+            
+            # Pagination par curseur (keyset) : "<created_at ISO>_<id>" du dernier voyage reçu.
+            # Pas d'OFFSET ni de COUNT(*), le coût ne dépend pas de la profondeur de page.
+            if cursor:
+                try:
+                    cursor_date, cursor_id = cursor.rsplit('_', 1)
+                    cursor_date = datetime.fromisoformat(cursor_date)
+                    cursor_id = int(cursor_id)
+                except ValueError:
+                    return jsonify({'success': False, 'error': 'Curseur de pagination invalide'}), 400
+                query = query.filter(or_(
+                    Trip.created_at < cursor_date,
+                    and_(Trip.created_at == cursor_date, Trip.id < cursor_id)
+                ))
+            
+            # Une ligne de plus que la page pour savoir s'il y a une suite
+            trips = query.order_by(Trip.created_at.desc(), Trip.id.desc()).limit(per_page + 1).all()
+            has_next = len(trips) > per_page
+            trips = trips[:per_page]
+            next_cursor = f"{trips[-1].created_at.isoformat()}_{trips[-1].id}" if has_next else None
+            
+            response = jsonify({
                 'success': True,
-                'trips': [trip.to_dict() for trip in trips],
+                'trips': [trip_to_dict_cached(trip) for trip in trips],
                 'pagination': {
-                    'total_pages': pagination.pages,
-                    'total_items': pagination.total,
-                    'current_page': pagination.page,
-                    'has_next': pagination.has_next,
-                    'has_prev': pagination.has_prev
+                    'per_page': per_page,
+                    'has_next': has_next,
+                    'next_cursor': next_cursor
                 }
             })
+            response.set_etag(etag)
+            return response
         
         elif request.method == 'POST':
             data = request.get_json()
             
             try:
                 client_id = None
+                new_client = None
                 form_data = data.get('form_data', {})
                 
                 # Gestion du client (existant ou nouveau)
@@ -1518,13 +1746,15 @@ def create_app():
                     client_id = int(form_data.get('client_id'))
                 elif data.get('client_email'):
                     # Vérifier si un client avec cet email existe déjà pour cette agence
-                    existing_client = Client.query.filter_by(
-                        agency_id=g.agency.id,
-                        email=data.get('client_email')
-                    ).first()
-
-                    if existing_client:
-                        client_id = existing_client.id
+                    existing_client_id = db.session.execute(
+                        select(Client.id).where(
+                            Client.agency_id == g.agency.id,
+                            Client.email == data.get('client_email')
+                        ).limit(1)
+                    ).scalar()
+
+                    if existing_client_id:
+                        client_id = existing_client_id
                     else:
                         new_client = Client(
                             agency_id=g.agency.id,
@@ -1533,23 +1763,22 @@ def create_app():
                             email=data.get('client_email', ''),
                             phone=data.get('client_phone', '')
                         )
-                        db.session.add(new_client)
-                        db.session.flush()
-                        client_id = new_client.id
 
                 # Déterminer le statut
                 status = data.get('status', 'proposed')
-                assigned_at = datetime.utcnow() if status == 'assigned' else None
+                assigned_at = utcnow() if status == 'assigned' else None
                 
                 # Créer le voyage
                 new_trip = Trip(
                     agency_id=g.agency.id,
                     user_id=g.user.id,
                     client_id=client_id,
-                    full_data_json=json.dumps(data),
+                    full_data_json=data,
                     hotel_name=form_data.get('hotel_name', 'Voyage sans hôtel'),
                     destination=form_data.get('destination', 'Destination inconnue'),
                     price=int(form_data.get('pack_price', 0)),
+                    date_start=normalize_trip_date(form_data.get('date_start')),
+                    date_end=normalize_trip_date(form_data.get('date_end')),
                     status=status,
                     is_day_trip=form_data.get('is_day_trip', False),
                     is_ultra_budget=form_data.get('is_ultra_budget', False),
@@ -1562,7 +1791,13 @@ def create_app():
                     return_time=form_data.get('return_time'),
                 )
                 
-                db.session.add(new_trip)
+                # Le nouveau client est lié par la relation : la clé étrangère est
+                # renseignée pendant le même flush que les deux INSERT
+                if new_client is not None:
+                    new_trip.client = new_client
+                    db.session.add_all([new_client, new_trip])
+                else:
+                    db.session.add(new_trip)
                 db.session.commit()
                 
                 # Log de l'activité
@@ -1593,13 +1828,8 @@ def create_app():
     @agency_required
     def api_update_trip(trip_id):
         """Met à jour un voyage existant."""
-        trip = Trip.query.get_or_404(trip_id)
+        trip = load_authorized_trip(trip_id)
 
-        # Sécurité : Vérifier l'appartenance et les permissions
-        if trip.agency_id != g.agency.id:
-            abort(403)
-        if g.user.role == 'seller' and trip.user_id != g.user.id:
-            abort(403)
         if trip.status == 'sold':
             return jsonify({'success': False, 'message': 'Impossible de modifier un voyage vendu.'}), 403
 
@@ -1611,6 +1841,10 @@ def create_app():
             trip.hotel_name = form_data.get('hotel_name', trip.hotel_name)
             trip.destination = form_data.get('destination', trip.destination)
             trip.price = int(form_data.get('pack_price', trip.price))
+            if 'date_start' in form_data:
+                trip.date_start = normalize_trip_date(form_data['date_start'])
+            if 'date_end' in form_data:
+                trip.date_end = normalize_trip_date(form_data['date_end'])
             trip.is_day_trip = form_data.get('is_day_trip', trip.is_day_trip)
             
             # Mettre à jour les champs spécifiques aux excursions
@@ -1622,9 +1856,25 @@ def create_app():
 
             # Mettre à jour le JSON complet
             # On fusionne les anciennes données avec les nouvelles pour ne rien perdre
-            current_full_data = json.loads(trip.full_data_json)
-            current_full_data['form_data'].update(form_data)
-            trip.full_data_json = json.dumps(current_full_data)
+            if db.engine.dialect.name == 'postgresql':
+                # Fusion faite par PostgreSQL (jsonb ||) : pas de décodage/réencodage
+                # du document complet côté Python, seul le patch est sérialisé
+                full_data = Trip.full_data_json
+                merged_form_data = func.coalesce(full_data['form_data'], cast('{}', JSONB)).op('||')(
+                    cast(json_dumps(form_data), JSONB)
+                )
+                db.session.execute(
+                    update(Trip).where(Trip.id == trip.id).values(
+                        full_data_json=full_data.op('||')(func.jsonb_build_object('form_data', merged_form_data))
+                    ),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.expire(trip, ['full_data_json'])
+            else:
+                # Nouveau dict : une mutation en place ne serait pas détectée par l'ORM
+                current_full_data = dict(trip.full_data_json)
+                current_full_data['form_data'] = {**current_full_data.get('form_data', {}), **form_data}
+                trip.full_data_json = current_full_data
 
             db.session.commit()
 
@@ -1647,11 +1897,8 @@ def create_app():
     def api_assign_client(trip_id):
         """Assigne un client à un voyage existant."""
         
-        trip = Trip.query.get_or_404(trip_id)
-
-        # Vérifier que le voyage appartient bien à l'agence de l'utilisateur
-        if trip.agency_id != g.user.agency_id:
-            abort(403, "Accès non autorisé à ce voyage.")
+        # Tout membre de l'agence peut assigner un client
+        trip = load_authorized_trip(trip_id, require_owner=False)
 
         data = request.get_json()
         client_id = data.get('client_id')
@@ -1666,7 +1913,7 @@ def create_app():
         try:
             trip.client_id = client.id
             trip.status = 'assigned'
-            trip.assigned_at = datetime.utcnow()
+            trip.assigned_at = utcnow()
             
             db.session.commit()
 
@@ -1695,23 +1942,12 @@ def create_app():
     def api_sell_trip(trip_id):
         """Marque un voyage comme vendu."""
         
-        trip = Trip.query.get_or_404(trip_id)
-
-        # Vérifier que le voyage appartient bien à l'agence de l'utilisateur
-        if trip.agency_id != g.user.agency_id:
-            abort(403, "Accès non autorisé à ce voyage.")
-
         # Seuls les admins ou le vendeur créateur peuvent marquer comme vendu
-        if g.user.role != 'agency_admin' and trip.user_id != g.user.id:
-            abort(403, "Vous n'avez pas la permission de modifier ce voyage.")
-
-        # Vérifier si une facture existe déjà pour éviter les doublons
-        if Invoice.query.filter_by(trip_id=trip.id).first():
-            return jsonify({'success': False, 'message': 'Une facture existe déjà pour ce voyage.'}), 409
+        trip = load_authorized_trip(trip_id)
 
         try:
             trip.status = 'sold'
-            trip.sold_at = datetime.utcnow()
+            trip.sold_at = utcnow()
             
             # NOUVEAU : Logique de création de facture
             new_invoice = Invoice(
@@ -1721,7 +1957,13 @@ def create_app():
             )
             db.session.add(new_invoice)
             
-            db.session.commit()
+            # La contrainte d'unicité sur invoice.trip_id sert de contrôle anti-doublon :
+            # mise à jour du voyage et facture partent dans la même transaction
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                return jsonify({'success': False, 'message': 'Une facture existe déjà pour ce voyage.'}), 409
 
             # Log de l'activité
             log_activity(
@@ -1747,14 +1989,7 @@ def create_app():
     @agency_required
     def api_add_trip_note(trip_id):
         """Ajoute une note interne à un voyage."""
-        trip = Trip.query.get_or_404(trip_id)
-
-        # Sécurité : Vérifier que le voyage appartient bien à l'agence
-        if trip.agency_id != g.agency.id:
-            abort(403)
-        # Sécurité : Vendeur ne peut commenter que ses propres voyages
-        if g.user.role == 'seller' and trip.user_id != g.user.id:
-            abort(403)
+        trip = load_authorized_trip(trip_id, light=True)
 
         data = request.get_json()
         content = data.get('content')
@@ -1790,11 +2025,7 @@ def create_app():
     @agency_required
     def api_publish_trip(trip_id):
         """Publie la fiche de présentation d'un voyage via FTP."""
-        trip = Trip.query.get_or_404(trip_id)
-
-        # Sécurité
-        if trip.agency_id != g.agency.id or (g.user.role == 'seller' and trip.user_id != g.user.id):
-            abort(403)
+        trip = load_authorized_trip(trip_id)
 
         # Vérifier si la configuration FTP existe
         ftp_config = g.agency_config.get('ftp_config')
@@ -1802,9 +2033,7 @@ def create_app():
             return jsonify({'success': False, 'message': 'La configuration FTP est manquante pour cette agence.'}), 400
 
         try:            # 1. Générer le HTML de la fiche
-            full_data = json.loads(trip.full_data_json)
-            template_type = 'day_trip' if trip.is_day_trip else 'standard'
-            html_content = render_trip_template(full_data, template_type, g.agency.template_name, g.agency.to_dict())
+            html_content = render_trip_html(trip)
 
             # 2. Publier via FTP
             filename = f"voyage-{trip.id}-{trip.destination.lower().replace(' ', '-')}.html"
@@ -1833,11 +2062,7 @@ def create_app():
     @agency_required
     def api_create_payment_link(trip_id):
         """Crée un lien de paiement Stripe pour un acompte."""
-        trip = Trip.query.get_or_404(trip_id)
-
-        # Sécurité
-        if trip.agency_id != g.agency.id or (g.user.role == 'seller' and trip.user_id != g.user.id):
-            abort(403)
+        trip = load_authorized_trip(trip_id)
 
         # Vérifier que le voyage est au moins assigné
         if trip.status == 'proposed':
@@ -1878,11 +2103,7 @@ def create_app():
     @agency_required
     def api_request_manual_payment(trip_id):
         """Enregistre une demande de paiement manuel pour un acompte."""
-        trip = Trip.query.get_or_404(trip_id)
-
-        # Sécurité
-        if trip.agency_id != g.agency.id or (g.user.role == 'seller' and trip.user_id != g.user.id):
-            abort(403)
+        trip = load_authorized_trip(trip_id)
 
         if trip.status == 'proposed':
             return jsonify({'success': False, 'message': 'Veuillez assigner un client avant de demander un paiement.'}), 400
@@ -1899,20 +2120,28 @@ def create_app():
             trip.down_payment_status = 'requested'
             db.session.commit()
 
-            # MODIFIÉ : Envoyer l'email au client
-            try:
+            # Envoyer l'email au client en arrière-plan (les erreurs sont loggées,
+            # l'utilisateur n'est pas bloqué par le serveur SMTP)
+            def _send_payment_email(trip_id, mail_config, agency_name, email_template, amount):
+                bg_trip = db.session.get(Trip, trip_id)
                 send_manual_payment_email(
                     app_mail=mail,
-                    agency_mail_config=g.agency_config.get('mail_config', {}),
-                    agency_name=g.agency.name,
-                    email_template=g.agency.manual_payment_email_template,
-                    trip=trip,
-                    client=trip.client,
+                    agency_mail_config=mail_config,
+                    agency_name=agency_name,
+                    email_template=email_template,
+                    trip=bg_trip,
+                    client=bg_trip.client,
                     amount=amount
                 )
-            except Exception as mail_error:
-                # Ne pas bloquer l'utilisateur, mais logger l'erreur
-                app.logger.warning(f"Erreur d'envoi d'email pour le voyage {trip.id}: {mail_error}")
+            
+            run_in_background(
+                _send_payment_email,
+                trip.id,
+                g.agency_config.get('mail_config', {}),
+                g.agency.name,
+                g.agency.manual_payment_email_template,
+                amount
+            )
 
             log_activity('manual_payment_requested', g.user.id, g.agency.id, trip.id, f"Acompte de {amount}€ demandé (manuel)")
 
@@ -1927,17 +2156,15 @@ def create_app():
     @agency_required
     def api_mark_as_paid(trip_id):
         """Marque l'acompte d'un paiement manuel comme payé."""
-        trip = Trip.query.get_or_404(trip_id)
-
-        # Sécurité
-        if trip.agency_id != g.agency.id or (g.user.role == 'seller' and trip.user_id != g.user.id):
-            abort(403)
+        trip = load_authorized_trip(trip_id, light=True)
 
         if trip.payment_method != 'manual':
             return jsonify({'success': False, 'message': 'Cette action est réservée aux paiements manuels.'}), 400
 
         try:
-            trip.down_payment_status = 'paid'
+            db.session.execute(
+                update(Trip).where(Trip.id == trip.id).values(down_payment_status='paid')
+            )
             db.session.commit()
 
             log_activity(
@@ -1974,10 +2201,23 @@ def create_app():
             }), 403
         
         if request.method == 'GET':
-            clients = Client.query.filter_by(agency_id=g.agency.id).order_by(
-                Client.created_at.desc()
-            ).all()
-            return jsonify([client.to_dict() for client in clients])
+            last_update, client_count = db.session.execute(
+                select(func.max(Client.updated_at), func.count(Client.id)).where(Client.agency_id == g.agency.id)
+            ).one()
+            etag = f"clients-{last_update}-{client_count}"
+            if request.if_none_match.contains(etag):
+                return not_modified(etag)
+            
+            # Lecture directe des colonnes (sans instancier d'objets ORM)
+            rows = db.session.execute(
+                select(
+                    Client.id, Client.agency_id, Client.full_name, Client.first_name,
+                    Client.last_name, Client.email, Client.phone, Client.address
+                ).where(Client.agency_id == g.agency.id).order_by(Client.created_at.desc())
+            ).mappings().all()
+            response = jsonify([dict(row) for row in rows])
+            response.set_etag(etag)
+            return response
         
         elif request.method == 'POST':
             data = request.get_json()
@@ -2049,14 +2289,16 @@ def create_app():
             }), 500
         
         try:
-            program = generate_program(
-                destination=data['destination'],
-                activities=data.get('activities', []),
-                departure_time=data.get('departure_time', '08:00'),
-                return_time=data.get('return_time', '20:00'),
-                gemini_api_key=gemini_api_key,
-                departure_address=data.get('departure_address', 'Bruxelles')
-            )
+            program_inputs = {
+                'destination': data['destination'],
+                'activities': data.get('activities', []),
+                'departure_time': data.get('departure_time', '08:00'),
+                'return_time': data.get('return_time', '20:00'),
+                'departure_address': data.get('departure_address', 'Bruxelles')
+            }
+            
+            # Les réponses Gemini réussies sont déjà mises en cache par le service (_stream_json)
+            program = generate_program(gemini_api_key=gemini_api_key, **program_inputs)
             
             return jsonify({
                 'success': True,
@@ -2112,15 +2354,27 @@ def create_app():
     # GESTION DES ERREURS
     # ==============================================================================
     
+    # Corps JSON des erreurs 403/404 sérialisés une seule fois : les messages viennent
+    # d'un ensemble fini d'appels abort(), inutile de refaire jsonify à chaque erreur
+    _error_bodies = {}
+    
+    def cached_error_response(label, e, status):
+        key = (status, str(e))
+        body = _error_bodies.get(key)
+        if body is None:
+            body = json.dumps({'error': label, 'message': key[1]})
+            _error_bodies[key] = body
+        return Response(body, status=status, mimetype='application/json')
+    
     @app.errorhandler(403)
     def forbidden(e):
         app.logger.warning(f"Accès refusé (403): {e} pour la route {request.path}")
-        return jsonify({'error': 'Accès refusé', 'message': str(e)}), 403
+        return cached_error_response('Accès refusé', e, 403)
     
     @app.errorhandler(404)
     def not_found(e):
         app.logger.warning(f"Ressource non trouvée (404): {e} pour la route {request.path}")
-        return jsonify({'error': 'Non trouvé', 'message': str(e)}), 404
+        return cached_error_response('Non trouvé', e, 404)
     
     @app.errorhandler(500)
     def internal_error(e):
@@ -1,6 +1,7 @@
 # config.py - Configuration de l'Application Odyssée SaaS
 import os
 from datetime import timedelta
+from functools import lru_cache
 
 class Config:
     """Configuration de base de l'application Flask."""
@@ -32,9 +33,24 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,  # Vérifie la connexion avant de l'utiliser
-        'pool_recycle': 300,     # Recycle les connexions après 5 minutes
+        # Recycle les connexions après DB_POOL_RECYCLE secondes (30 min par défaut) :
+        # protège des coupures NAT/pare-feu, pool_pre_ping gère déjà les connexions mortes
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
     }
     
+    # Dimensionnement du pool (PostgreSQL uniquement, SQLite n'utilise pas de QueuePool)
+    # Le pool est propre à chaque worker gunicorn : une connexion par thread du worker
+    # (GUNICORN_THREADS), au minimum 5. Total côté serveur ≈ WEB_CONCURRENCY × (pool_size + max_overflow).
+    if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+        _default_pool_size = max(5, int(os.environ.get('GUNICORN_THREADS', 4)))
+        SQLALCHEMY_ENGINE_OPTIONS.update({
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', _default_pool_size)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            # Coupe les requêtes bloquées au bout de 60 s côté serveur
+            'connect_args': {'options': f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 60000))}"},
+        })
+    
     # ==============================================================================
     # SESSION & REDIS
     # ==============================================================================
@@ -104,6 +120,11 @@ class Config:
     DEFAULT_TEMPLATE = 'classic'
     DEFAULT_PRIMARY_COLOR = '#3B82F6'
     
+    # Cache Jinja2 : templates compilés gardés en mémoire + bytecode sur disque
+    # (dossier temporaire du système si JINJA_BYTECODE_CACHE_DIR n'est pas défini)
+    JINJA_CACHE_SIZE = int(os.environ.get('JINJA_CACHE_SIZE') or 500)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    
     # ==============================================================================
     # PUBLICATION (URLs de base)
     # ==============================================================================
@@ -157,8 +178,12 @@ class ProductionConfig(Config):
 # SÉLECTION AUTOMATIQUE DE LA CONFIG
 # ==============================================================================
 
+@lru_cache(maxsize=1)
 def get_config():
-    """Retourne la configuration appropriée selon l'environnement."""
+    """
+    Retourne la configuration appropriée selon l'environnement.
+    Résultat mémorisé : l'environnement est lu (et validé en production) une seule fois par processus.
+    """
     env = os.environ.get('FLASK_ENV', 'development')
     
     if env == 'production':
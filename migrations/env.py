@@ -88,6 +88,12 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # Le mode batch recrée les tables (DROP puis RENAME) : avec les clés étrangères
+            # actives (models._sqlite_foreign_keys), le DROP déclencherait les ON DELETE CASCADE
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+
         context.configure(
             connection=connection, target_metadata=target_db.metadata, **conf_args
         )
@@ -0,0 +1,72 @@
+"""Store Trip.document_filenames as a list instead of CSV text
+
+Revision ID: 0a9e4c7b2d51
+Revises: f3b8d2a7c614
+Create Date: 2025-10-24 11:37:48.902116
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = '0a9e4c7b2d51'
+down_revision = 'f3b8d2a7c614'
+branch_labels = None
+depends_on = None
+
+
+trip_table = sa.table(
+    'trip',
+    sa.column('id', sa.Integer),
+    sa.column('document_filenames', sa.Text),
+)
+
+
+def _rewrite_sqlite(convert):
+    """Réécrit la colonne texte ligne par ligne (SQLite n'a pas de type tableau)."""
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(trip_table.c.id, trip_table.c.document_filenames)
+        .where(trip_table.c.document_filenames.isnot(None))
+    ).fetchall()
+    for trip_id, value in rows:
+        conn.execute(
+            trip_table.update()
+            .where(trip_table.c.id == trip_id)
+            .values(document_filenames=convert(value))
+        )
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.batch_alter_table('trip', schema=None) as batch_op:
+            batch_op.alter_column(
+                'document_filenames',
+                existing_type=sa.Text(),
+                type_=postgresql.ARRAY(sa.String(length=255)),
+                existing_nullable=True,
+                postgresql_using="string_to_array(NULLIF(document_filenames, ''), ',')::varchar(255)[]"
+            )
+    else:
+        # CSV -> liste JSON
+        _rewrite_sqlite(lambda value: json.dumps([name for name in value.split(',') if name]))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.batch_alter_table('trip', schema=None) as batch_op:
+            batch_op.alter_column(
+                'document_filenames',
+                existing_type=postgresql.ARRAY(sa.String(length=255)),
+                type_=sa.Text(),
+                existing_nullable=True,
+                postgresql_using="array_to_string(document_filenames, ',')"
+            )
+    else:
+        # Liste JSON -> CSV
+        _rewrite_sqlite(lambda value: ','.join(json.loads(value)))
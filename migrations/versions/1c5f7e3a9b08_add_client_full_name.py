@@ -0,0 +1,35 @@
+"""Add computed full_name column to Client
+
+Revision ID: 1c5f7e3a9b08
+Revises: 0a9e4c7b2d51
+Create Date: 2025-10-24 14:20:56.447193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = '1c5f7e3a9b08'
+down_revision = '0a9e4c7b2d51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite n'accepte pas ADD COLUMN pour une colonne générée STORED :
+    # on y force la recréation de la table
+    recreate = 'always' if op.get_bind().dialect.name == 'sqlite' else 'auto'
+
+    with op.batch_alter_table('client', schema=None, recreate=recreate) as batch_op:
+        batch_op.add_column(sa.Column(
+            'full_name', sa.String(length=201),
+            sa.Computed("first_name || ' ' || last_name", persisted=True),
+            nullable=True
+        ))
+
+
+def downgrade():
+    with op.batch_alter_table('client', schema=None) as batch_op:
+        batch_op.drop_column('full_name')
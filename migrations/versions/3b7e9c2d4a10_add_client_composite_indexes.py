@@ -0,0 +1,29 @@
+"""Add composite indexes on Client
+
+Revision ID: 3b7e9c2d4a10
+Revises: 79086f1b2d7b
+Create Date: 2025-10-20 09:12:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e9c2d4a10'
+down_revision = '79086f1b2d7b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('client', schema=None) as batch_op:
+        batch_op.create_index('ix_client_agency_email', ['agency_id', 'email'], unique=False)
+        batch_op.create_index('ix_client_agency_created', ['agency_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('client', schema=None) as batch_op:
+        batch_op.drop_index('ix_client_agency_created')
+        batch_op.drop_index('ix_client_agency_email')
@@ -0,0 +1,41 @@
+"""Add unique constraint on Invoice.trip_id
+
+Revision ID: 5d1f8a6b2c93
+Revises: 3b7e9c2d4a10
+Create Date: 2025-10-20 14:03:51.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1f8a6b2c93'
+down_revision = '3b7e9c2d4a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # Doublons créés par des ventes concurrentes : on garde la première facture de chaque voyage,
+    # sans quoi la contrainte unique ne peut pas être posée
+    conn.execute(sa.text(
+        'DELETE FROM invoice WHERE id NOT IN (SELECT MIN(id) FROM invoice GROUP BY trip_id)'
+    ))
+
+    # La contrainte unique crée son propre index : l'ancien index simple devient redondant
+    existing_indexes = {index['name'] for index in sa.inspect(conn).get_indexes('invoice')}
+
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        if 'ix_invoice_trip_id' in existing_indexes:
+            batch_op.drop_index('ix_invoice_trip_id')
+        batch_op.create_unique_constraint('uq_invoice_trip_id', ['trip_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_invoice_trip_id', type_='unique')
+        batch_op.create_index('ix_invoice_trip_id', ['trip_id'], unique=False)
@@ -0,0 +1,33 @@
+"""Server-side default for Invoice and TripNote created_at
+
+Revision ID: 7a4c2e91d5f6
+Revises: 5d1f8a6b2c93
+Create Date: 2025-10-21 08:47:12.660391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c2e91d5f6'
+down_revision = '5d1f8a6b2c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=sa.func.now())
+
+    with op.batch_alter_table('trip_note', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=sa.func.now())
+
+
+def downgrade():
+    with op.batch_alter_table('trip_note', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=None)
+
+    with op.batch_alter_table('invoice', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=None)
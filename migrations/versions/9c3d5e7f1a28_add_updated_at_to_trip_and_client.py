@@ -0,0 +1,37 @@
+"""Add updated_at to Trip and Client
+
+Revision ID: 9c3d5e7f1a28
+Revises: 7a4c2e91d5f6
+Create Date: 2025-10-21 16:25:40.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3d5e7f1a28'
+down_revision = '7a4c2e91d5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite refuse ADD COLUMN avec un défaut non constant (CURRENT_TIMESTAMP) :
+    # on y force la recréation de la table, ailleurs un simple ALTER TABLE suffit
+    recreate = 'always' if op.get_bind().dialect.name == 'sqlite' else 'auto'
+
+    with op.batch_alter_table('client', schema=None, recreate=recreate) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True))
+
+    with op.batch_alter_table('trip', schema=None, recreate=recreate) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('trip', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('client', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
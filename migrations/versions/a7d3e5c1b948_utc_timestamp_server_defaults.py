@@ -0,0 +1,45 @@
+"""UTC server defaults for timestamp columns
+
+Revision ID: a7d3e5c1b948
+Revises: 1c5f7e3a9b08
+Create Date: 2025-10-27 10:12:44.301957
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e5c1b948'
+down_revision = '1c5f7e3a9b08'
+branch_labels = None
+depends_on = None
+
+
+# (table, colonne) : colonnes DateTime sans fuseau, stockées en UTC
+TIMESTAMP_COLUMNS = [
+    ('agency', 'created_at'),
+    ('agency', 'updated_at'),
+    ('user', 'created_at'),
+    ('client', 'created_at'),
+    ('client', 'updated_at'),
+    ('trip', 'created_at'),
+    ('trip', 'updated_at'),
+    ('invoice', 'created_at'),
+    ('activity_log', 'created_at'),
+    ('trip_note', 'created_at'),
+]
+
+
+def upgrade():
+    # now() stockait l'heure locale de la session PostgreSQL : défaut en UTC, comme les lignes existantes
+    for table, column in TIMESTAMP_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.DateTime(), server_default=utcnow())
+
+
+def downgrade():
+    for table, column in reversed(TIMESTAMP_COLUMNS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.DateTime(), server_default=sa.func.now())
@@ -0,0 +1,73 @@
+"""Add date_start / date_end columns to Trip
+
+Revision ID: b2e6f0a3c715
+Revises: 9c3d5e7f1a28
+Create Date: 2025-10-22 10:31:08.947215
+
+"""
+import json
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e6f0a3c715'
+down_revision = '9c3d5e7f1a28'
+branch_labels = None
+depends_on = None
+
+
+def _normalize_date(value):
+    """Date ISO AAAA-MM-JJ (comme normalize_trip_date dans app.py), None si invalide."""
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    try:
+        return date.fromisoformat(value[:10]).isoformat()
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, '%d/%m/%Y').date().isoformat()
+    except ValueError:
+        return None
+
+
+def upgrade():
+    with op.batch_alter_table('trip', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('date_start', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('date_end', sa.String(length=20), nullable=True))
+        batch_op.create_index(batch_op.f('ix_trip_date_start'), ['date_start'], unique=False)
+        batch_op.create_index(batch_op.f('ix_trip_date_end'), ['date_end'], unique=False)
+
+    # Recopier les dates existantes depuis le JSON
+    trip_table = sa.table(
+        'trip',
+        sa.column('id', sa.Integer),
+        sa.column('full_data_json', sa.Text),
+        sa.column('date_start', sa.String),
+        sa.column('date_end', sa.String),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(trip_table.c.id, trip_table.c.full_data_json)).fetchall()
+    for trip_id, full_data_json in rows:
+        try:
+            form_data = json.loads(full_data_json).get('form_data', {})
+        except (TypeError, ValueError):
+            continue
+        conn.execute(
+            trip_table.update().where(trip_table.c.id == trip_id).values(
+                date_start=_normalize_date(form_data.get('date_start')),
+                date_end=_normalize_date(form_data.get('date_end')),
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('trip', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_trip_date_end'))
+        batch_op.drop_index(batch_op.f('ix_trip_date_start'))
+        batch_op.drop_column('date_end')
+        batch_op.drop_column('date_start')
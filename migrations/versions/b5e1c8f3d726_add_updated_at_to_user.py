@@ -0,0 +1,31 @@
+"""Add updated_at to User
+
+Revision ID: b5e1c8f3d726
+Revises: a7d3e5c1b948
+Create Date: 2025-10-28 09:41:17.552208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1c8f3d726'
+down_revision = 'a7d3e5c1b948'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite refuse ADD COLUMN avec un défaut non constant (CURRENT_TIMESTAMP) :
+    # on y force la recréation de la table, ailleurs un simple ALTER TABLE suffit
+    recreate = 'always' if op.get_bind().dialect.name == 'sqlite' else 'auto'
+
+    with op.batch_alter_table('user', schema=None, recreate=recreate) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=utcnow(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,31 @@
+"""Add composite indexes on Trip
+
+Revision ID: c8a1d4f6e2b9
+Revises: b2e6f0a3c715
+Create Date: 2025-10-22 15:12:44.305871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8a1d4f6e2b9'
+down_revision = 'b2e6f0a3c715'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('trip', schema=None) as batch_op:
+        batch_op.create_index('ix_trip_agency_status_created', ['agency_id', 'status', 'created_at'], unique=False)
+        batch_op.create_index('ix_trip_agency_user_status', ['agency_id', 'user_id', 'status'], unique=False)
+        batch_op.create_index('ix_trip_agency_created_id', ['agency_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('trip', schema=None) as batch_op:
+        batch_op.drop_index('ix_trip_agency_created_id')
+        batch_op.drop_index('ix_trip_agency_user_status')
+        batch_op.drop_index('ix_trip_agency_status_created')
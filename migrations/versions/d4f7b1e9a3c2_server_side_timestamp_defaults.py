@@ -0,0 +1,42 @@
+"""Server-side defaults for timestamps and quota dates
+
+Revision ID: d4f7b1e9a3c2
+Revises: c8a1d4f6e2b9
+Create Date: 2025-10-23 09:05:19.772640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f7b1e9a3c2'
+down_revision = 'c8a1d4f6e2b9'
+branch_labels = None
+depends_on = None
+
+
+# (table, colonne, type, défaut serveur)
+TIMESTAMP_DEFAULTS = [
+    ('agency', 'created_at', sa.DateTime(), sa.func.now()),
+    ('agency', 'updated_at', sa.DateTime(), sa.func.now()),
+    ('agency', 'usage_reset_date', sa.Date(), sa.func.current_date()),
+    ('user', 'created_at', sa.DateTime(), sa.func.now()),
+    ('user', 'last_generation_date', sa.Date(), sa.func.current_date()),
+    ('client', 'created_at', sa.DateTime(), sa.func.now()),
+    ('trip', 'created_at', sa.DateTime(), sa.func.now()),
+    ('activity_log', 'created_at', sa.DateTime(), sa.func.now()),
+]
+
+
+def upgrade():
+    for table, column, column_type, default in TIMESTAMP_DEFAULTS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=column_type, server_default=default)
+
+
+def downgrade():
+    for table, column, column_type, default in reversed(TIMESTAMP_DEFAULTS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=column_type, server_default=None)
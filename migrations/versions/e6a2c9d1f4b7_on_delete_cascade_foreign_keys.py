@@ -0,0 +1,63 @@
+"""ON DELETE CASCADE / SET NULL on foreign keys
+
+Revision ID: e6a2c9d1f4b7
+Revises: d4f7b1e9a3c2
+Create Date: 2025-10-23 15:42:07.318904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a2c9d1f4b7'
+down_revision = 'd4f7b1e9a3c2'
+branch_labels = None
+depends_on = None
+
+
+# (table, colonne, table référencée, action ON DELETE)
+FOREIGN_KEYS = [
+    ('user', 'agency_id', 'agency', 'CASCADE'),
+    ('client', 'agency_id', 'agency', 'CASCADE'),
+    ('trip', 'agency_id', 'agency', 'CASCADE'),
+    ('trip', 'client_id', 'client', 'SET NULL'),
+    ('invoice', 'trip_id', 'trip', 'CASCADE'),
+    ('trip_note', 'trip_id', 'trip', 'CASCADE'),
+    ('activity_log', 'agency_id', 'agency', 'CASCADE'),
+    ('activity_log', 'trip_id', 'trip', 'SET NULL'),
+]
+
+# Les clés étrangères ont été créées sans nom : PostgreSQL les nomme
+# <table>_<colonne>_fkey, SQLite n'en garde aucun. On applique donc une
+# convention de nommage au moment de la recréation de table (SQLite).
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+
+def _fk_name(table, column, referred, is_sqlite):
+    if is_sqlite:
+        return f'fk_{table}_{column}_{referred}'
+    return f'{table}_{column}_fkey'
+
+
+def _set_on_delete(foreign_keys, with_action):
+    is_sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table, column, referred, action in foreign_keys:
+        name = _fk_name(table, column, referred, is_sqlite)
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(
+                name, referred, [column], ['id'],
+                ondelete=action if with_action else None
+            )
+
+
+def upgrade():
+    _set_on_delete(FOREIGN_KEYS, with_action=True)
+
+
+def downgrade():
+    _set_on_delete(reversed(FOREIGN_KEYS), with_action=False)
@@ -0,0 +1,53 @@
+"""Store Trip.full_data_json as JSONB on PostgreSQL
+
+Revision ID: f3b8d2a7c614
+Revises: e6a2c9d1f4b7
+Create Date: 2025-10-24 10:12:33.580271
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from models import * # Importer tous les modèles pour qu'Alembic les détecte
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2a7c614'
+down_revision = 'e6a2c9d1f4b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite stocke le type JSON en texte : rien à convertir
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.batch_alter_table('trip', schema=None) as batch_op:
+        batch_op.alter_column(
+            'full_data_json',
+            existing_type=sa.Text(),
+            type_=postgresql.JSONB(),
+            existing_nullable=False,
+            postgresql_using='full_data_json::jsonb'
+        )
+
+    op.execute(
+        "CREATE INDEX ix_trip_form_data ON trip USING gin ((full_data_json -> 'form_data'))"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_trip_form_data")
+
+    with op.batch_alter_table('trip', schema=None) as batch_op:
+        batch_op.alter_column(
+            'full_data_json',
+            existing_type=postgresql.JSONB(),
+            type_=sa.Text(),
+            existing_nullable=False,
+            postgresql_using='full_data_json::text'
+        )
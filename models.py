@@ -1,9 +1,93 @@
 # models.py - Application SaaS Multi-Agences Odyssée
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, date
-from cryptography.fernet import Fernet
-import json
-import os
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import DateTime
+from datetime import datetime
+from functools import wraps
+import sqlite3
+
+# orjson (2 à 5x plus rapide) si disponible, sinon json standard
+try:
+    import orjson
+
+    def json_loads(data):
+        return orjson.loads(data)
+
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    import json
+
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+
+class utcnow(FunctionElement):
+    """
+    Horodatage UTC calculé par la base (défauts serveur des colonnes DateTime).
+    Les colonnes sont sans fuseau : now() y stockerait l'heure locale de la session PostgreSQL.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow, 'postgresql')
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    # SQLite : CURRENT_TIMESTAMP est déjà en UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    """
+    SQLite n'applique les clés étrangères (ON DELETE CASCADE / SET NULL) qu'avec ce PRAGMA,
+    à activer sur chaque connexion : les relations en passive_deletes en dépendent.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+# Formatage des dates pour to_dict() : f-strings simples, sans passer par strftime
+def _fmt_date(value):
+    """JJ/MM/AAAA"""
+    return f"{value.day:02d}/{value.month:02d}/{value.year}"
+
+
+def _fmt_datetime(value):
+    """JJ/MM/AAAA à HH:MM"""
+    return f"{value.day:02d}/{value.month:02d}/{value.year} à {value.hour:02d}:{value.minute:02d}"
+
+
+def per_request_cache(method):
+    """
+    Mémorise le résultat de to_dict() pour la durée de la requête (dans flask.g),
+    par couple (modèle, id). Hors requête ou avant insertion (id None), calcul direct.
+    """
+    @wraps(method)
+    def wrapper(self):
+        if self.id is None or not has_request_context():
+            return method(self)
+        
+        dict_cache = g.setdefault('_dict_cache', {})
+        key = (type(self).__name__, self.id)
+        result = dict_cache.get(key)
+        if result is None:
+            result = dict_cache[key] = method(self)
+        return result
+    return wrapper
+
 
 db = SQLAlchemy()
 
@@ -45,18 +129,21 @@ class Agency(db.Model):
     subscription_tier = db.Column(db.String(50), default='basic')  # basic/pro/enterprise
     monthly_generation_limit = db.Column(db.Integer, default=100)
     current_month_usage = db.Column(db.Integer, default=0)
-    usage_reset_date = db.Column(db.Date, default=date.today)
+    usage_reset_date = db.Column(db.Date, server_default=db.func.current_date())
     
     # Métadonnées
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=datetime.utcnow)
     
     # Relations
-    users = db.relationship('User', backref='agency', lazy=True, cascade='all, delete-orphan')
-    trips = db.relationship('Trip', backref='agency', lazy=True, cascade='all, delete-orphan')
-    clients = db.relationship('Client', backref='agency', lazy=True, cascade='all, delete-orphan')
-    activities = db.relationship('ActivityLog', backref='agency', lazy=True, cascade='all, delete-orphan', order_by="ActivityLog.created_at.desc()")
-    
+    # Suppression en cascade déléguée à la base (ON DELETE CASCADE) : l'ORM ne charge
+    # pas les lignes liées avant de supprimer l'agence
+    users = db.relationship('User', backref='agency', lazy=True, cascade='save-update, merge, delete', passive_deletes=True)
+    trips = db.relationship('Trip', backref='agency', lazy=True, cascade='save-update, merge, delete', passive_deletes=True)
+    clients = db.relationship('Client', backref='agency', lazy=True, cascade='save-update, merge, delete', passive_deletes=True)
+    activities = db.relationship('ActivityLog', backref='agency', lazy=True, cascade='save-update, merge, delete', passive_deletes=True, order_by="ActivityLog.created_at.desc()")
+    
+    @per_request_cache
     def to_dict(self):
         """Représentation JSON (sans les données sensibles)"""
         return {
@@ -94,7 +181,7 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     
     # Liaison à l'agence (NULL pour super_admin uniquement)
-    agency_id = db.Column(db.Integer, db.ForeignKey('agency.id'), nullable=True, index=True)
+    agency_id = db.Column(db.Integer, db.ForeignKey('agency.id', ondelete='CASCADE'), nullable=True, index=True)
     
     # Authentification
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
@@ -111,17 +198,19 @@ class User(db.Model):
     
     # Quotas de génération (pour les vendeurs)
     generation_count = db.Column(db.Integer, default=0)
-    last_generation_date = db.Column(db.Date, default=date.today)
+    last_generation_date = db.Column(db.Date, server_default=db.func.current_date())
     daily_generation_limit = db.Column(db.Integer, default=5)
     
     # Métadonnées
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=datetime.utcnow)
     last_login = db.Column(db.DateTime)
     
     # Relations
     trips = db.relationship('Trip', backref='user', lazy=True)
     
+    @per_request_cache
     def to_dict(self):
         return {
             'id': self.id,
@@ -146,20 +235,28 @@ class User(db.Model):
 
 class Client(db.Model):
     """Clients finaux qui achètent des voyages."""
+    __table_args__ = (
+        db.Index('ix_client_agency_email', 'agency_id', 'email'),
+        db.Index('ix_client_agency_created', 'agency_id', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     
     # Liaison à l'agence
-    agency_id = db.Column(db.Integer, db.ForeignKey('agency.id'), nullable=False, index=True)
+    agency_id = db.Column(db.Integer, db.ForeignKey('agency.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Informations client
     first_name = db.Column(db.String(100), nullable=False)
     last_name = db.Column(db.String(100), nullable=False)
+    # Nom complet calculé et stocké par la base (pas de concaténation à chaque sérialisation)
+    full_name = db.Column(db.String(201), db.Computed("first_name || ' ' || last_name", persisted=True))
     email = db.Column(db.String(120), nullable=True, index=True)
     phone = db.Column(db.String(50))
     address = db.Column(db.Text)
     
     # Métadonnées
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=datetime.utcnow)
     
     # Relations
     trips = db.relationship('Trip', backref='client', lazy=True)
@@ -168,7 +265,7 @@ class Client(db.Model):
         return {
             'id': self.id,
             'agency_id': self.agency_id,
-            'full_name': f"{self.first_name} {self.last_name}",
+            'full_name': self.full_name,
             'first_name': self.first_name,
             'last_name': self.last_name,
             'email': self.email,
@@ -186,21 +283,36 @@ class Client(db.Model):
 
 class Trip(db.Model):
     """Représente un voyage créé/proposé/vendu."""
+    __table_args__ = (
+        # Compteurs du tableau de bord (admin : agence + statut, vendeur : agence + vendeur + statut)
+        db.Index('ix_trip_agency_status_created', 'agency_id', 'status', 'created_at'),
+        db.Index('ix_trip_agency_user_status', 'agency_id', 'user_id', 'status'),
+        # Listes triées par date (pagination par curseur created_at, id)
+        db.Index('ix_trip_agency_created_id', 'agency_id', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     
     # Liaisons
-    agency_id = db.Column(db.Integer, db.ForeignKey('agency.id'), nullable=False, index=True)
+    agency_id = db.Column(db.Integer, db.ForeignKey('agency.id', ondelete='CASCADE'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
-    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=True, index=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id', ondelete='SET NULL'), nullable=True, index=True)
     
-    # Données complètes du voyage (JSON)
-    full_data_json = db.Column(db.Text, nullable=False)
+    # Données complètes du voyage : JSONB sur PostgreSQL (sous-champs interrogeables,
+    # index GIN sur form_data créé par migration), JSON texte sur SQLite.
+    # La colonne renvoie directement un dict Python.
+    full_data_json = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
     
     # Informations principales (pour requêtes rapides)
     hotel_name = db.Column(db.String(200), nullable=False, index=True)
     destination = db.Column(db.String(200), nullable=False, index=True)
     price = db.Column(db.Integer, nullable=False)
     
+    # Dates du séjour, recopiées depuis form_data à l'écriture (format ISO AAAA-MM-JJ,
+    # tel que saisi) : évite de décoder full_data_json pour les afficher ou filtrer
+    date_start = db.Column(db.String(20), index=True)
+    date_end = db.Column(db.String(20), index=True)
+    
     # Status du voyage
     status = db.Column(db.String(50), nullable=False, default='proposed', index=True)
     # Valeurs possibles: proposed, assigned, sold
@@ -229,36 +341,71 @@ class Trip(db.Model):
     balance_due_date = db.Column(db.Date)
     
     # Documents attachés
-    document_filenames = db.Column(db.Text)  # Liste séparée par virgules
+    # Liste de noms de fichiers : ARRAY natif sur PostgreSQL, liste JSON sur SQLite
+    document_filenames = db.Column(db.JSON().with_variant(ARRAY(db.String(255)), 'postgresql'))
     
     # Dates importantes
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # updated_at est calculé côté Python (précision à la microseconde) : il sert de version
+    # pour l'ETag de la liste et le cache de sérialisation, CURRENT_TIMESTAMP de SQLite
+    # s'arrêtant à la seconde
+    created_at = db.Column(db.DateTime, server_default=utcnow(), index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=datetime.utcnow)
     assigned_at = db.Column(db.DateTime)
     sold_at = db.Column(db.DateTime, index=True)
     
     # Relations
-    invoices = db.relationship('Invoice', backref='trip', lazy=True, cascade="all, delete-orphan")
-    notes = db.relationship('TripNote', backref='trip', lazy=True, cascade="all, delete-orphan", order_by="TripNote.created_at.desc()")
+    invoices = db.relationship('Invoice', backref='trip', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    notes = db.relationship('TripNote', backref='trip', lazy=True, cascade="all, delete-orphan", passive_deletes=True, order_by="TripNote.created_at.desc()")
+    
+    @classmethod
+    def load_light(cls, trip_id, *criteria):
+        """
+        Charge uniquement les colonnes utiles aux contrôles d'accès (sans full_data_json).
+        
+        Args:
+            trip_id: ID du voyage
+            *criteria: Conditions supplémentaires (ex: appartenance à l'agence)
+        
+        Returns:
+            Row (id, agency_id, user_id, client_id, status, price, destination,
+            payment_method, down_payment_amount) ou None si le voyage n'existe pas
+        """
+        return db.session.execute(
+            db.select(
+                cls.id, cls.agency_id, cls.user_id, cls.client_id, cls.status, cls.price,
+                cls.destination, cls.payment_method, cls.down_payment_amount
+            ).where(cls.id == trip_id, *criteria)
+        ).first()
+    
+    @property
+    def form_data(self):
+        """form_data du voyage (full_data_json est déjà décodé par la colonne JSON)."""
+        return self.full_data_json.get('form_data', {})
     
     def to_dict(self):
         """Représentation JSON du voyage."""
-        full_data = json.loads(self.full_data_json)
-        form_data = full_data.get('form_data', {})
+        return {**self.own_dict(), **self.related_dict()}
+    
+    def own_dict(self):
+        """
+        Partie de to_dict() issue des seules colonnes du voyage : ne change qu'avec
+        updated_at, elle peut donc être mise en cache sous cette version.
+        """
+        date_start, date_end = self.date_start, self.date_end
+        if date_start is None and date_end is None:
+            # Voyages antérieurs aux colonnes de dates : lecture depuis le JSON
+            date_start = self.form_data.get('date_start')
+            date_end = self.form_data.get('date_end')
         
-        client_full_name = None
-        client_email = None
-        client_phone = None
-        
-        if self.client:
-            client_full_name = self.client.to_dict()['full_name']
-            client_email = self.client.email
-            client_phone = self.client.phone
+        # Dates lues une seule fois
+        assigned_at = self.assigned_at
+        sold_at = self.sold_at
+        balance_due_date = self.balance_due_date
         
         return {
             'id': self.id,
             'agency_id': self.agency_id,
             'user_id': self.user_id,
-            'creator_pseudo': self.user.pseudo if self.user else 'N/A',
             'hotel_name': self.hotel_name,
             'destination': self.destination,
             'price': self.price,
@@ -267,17 +414,37 @@ class Trip(db.Model):
             'published_filename': self.published_filename,
             'is_ultra_budget': self.is_ultra_budget,
             'client_published_filename': self.client_published_filename,
+            'created_at': _fmt_date(self.created_at),
+            'assigned_at': _fmt_date(assigned_at) if assigned_at else None,
+            'sold_at': _fmt_date(sold_at) if sold_at else None,
+            'down_payment_amount': self.down_payment_amount,
+            'balance_due_date': balance_due_date.isoformat() if balance_due_date else None,
+            'date_start': date_start,
+            'date_end': date_end,
+            'document_filenames': self.document_filenames or []
+        }
+    
+    def related_dict(self):
+        """
+        Partie de to_dict() issue des lignes liées (vendeur, client, factures), dont les
+        modifications ne touchent pas updated_at du voyage : toujours lue à jour.
+        """
+        # Relations lues une seule fois
+        client = self.client
+        user = self.user
+        
+        if client is not None:
+            client_full_name = client.full_name
+            client_email = client.email
+            client_phone = client.phone
+        else:
+            client_full_name = client_email = client_phone = None
+        
+        return {
+            'creator_pseudo': user.pseudo if user is not None else 'N/A',
             'client_full_name': client_full_name,
             'client_email': client_email,
             'client_phone': client_phone,
-            'created_at': self.created_at.strftime('%d/%m/%Y'),
-            'assigned_at': self.assigned_at.strftime('%d/%m/%Y') if self.assigned_at else None,
-            'sold_at': self.sold_at.strftime('%d/%m/%Y') if self.sold_at else None,
-            'down_payment_amount': self.down_payment_amount,
-            'balance_due_date': self.balance_due_date.strftime('%Y-%m-%d') if self.balance_due_date else None,
-            'date_start': form_data.get('date_start'),
-            'date_end': form_data.get('date_end'),
-            'document_filenames': self.document_filenames.split(',') if self.document_filenames else [],
             'invoices': [invoice.to_dict() for invoice in self.invoices]
         }
     
@@ -291,22 +458,26 @@ class Trip(db.Model):
 
 class Invoice(db.Model):
     """Factures générées pour les voyages vendus."""
+    __table_args__ = (
+        db.UniqueConstraint('trip_id', name='uq_invoice_trip_id'),  # Une seule facture par voyage
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     
     # Numéro unique de facture
     invoice_number = db.Column(db.String(50), unique=True, nullable=False, index=True)
     
     # Liaison au voyage
-    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id'), nullable=False, index=True)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id', ondelete='CASCADE'), nullable=False)  # Indexé par uq_invoice_trip_id
     
     # Date de création
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
     
     def to_dict(self):
         return {
             'id': self.id,
             'invoice_number': self.invoice_number,
-            'created_at': self.created_at.strftime('%d/%m/%Y')
+            'created_at': _fmt_date(self.created_at)
         }
     
     def __repr__(self):
@@ -322,16 +493,16 @@ class ActivityLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     
     # Liaisons
-    agency_id = db.Column(db.Integer, db.ForeignKey('agency.id'), nullable=False, index=True)
+    agency_id = db.Column(db.Integer, db.ForeignKey('agency.id', ondelete='CASCADE'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
-    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id'), nullable=True, index=True)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id', ondelete='SET NULL'), nullable=True, index=True)
     
     # Description de l'action
     action = db.Column(db.String(100), nullable=False, index=True) # Ex: 'trip_created', 'trip_sold'
     details = db.Column(db.String(255)) # Ex: "Voyage à Paris"
     
     # Date de création
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    created_at = db.Column(db.DateTime, server_default=utcnow(), index=True)
 
     # Relations
     user = db.relationship('User', backref='activities')
@@ -345,7 +516,7 @@ class ActivityLog(db.Model):
             'details': self.details,
             'trip_id': self.trip_id,
             'trip_destination': self.trip.destination if self.trip else None,
-            'created_at': self.created_at.strftime('%d/%m/%Y à %H:%M')
+            'created_at': _fmt_datetime(self.created_at)
         }
 
 
@@ -361,11 +532,11 @@ class TripNote(db.Model):
     content = db.Column(db.Text, nullable=False)
     
     # Liaisons
-    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id'), nullable=False, index=True)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trip.id', ondelete='CASCADE'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     
     # Date de création
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
 
     # Relation pour récupérer l'auteur de la note
     author = db.relationship('User', backref='notes')
@@ -375,5 +546,32 @@ class TripNote(db.Model):
             'id': self.id,
             'content': self.content,
             'author_pseudo': self.author.pseudo,
-            'created_at': self.created_at.strftime('%d/%m/%Y à %H:%M')
-        }
\ No newline at end of file
+            'created_at': _fmt_datetime(self.created_at)
+        }
+
+# ==============================================================================
+# INSERTIONS EN MASSE
+# ==============================================================================
+
+def bulk_create(model, rows, commit=True):
+    """
+    Insère plusieurs lignes en un seul INSERT exécuté en executemany,
+    sans passer par l'unité de travail de la session (imports, scripts de seed).
+    Pour une seule ligne, garder db.session.add().
+    
+    Args:
+        model: Classe du modèle (ex: Client)
+        rows: Liste de dictionnaires {colonne: valeur}
+        commit: Valider la transaction après l'insertion
+    
+    Returns:
+        int: Nombre de lignes insérées
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    
+    db.session.execute(db.insert(model), rows)
+    if commit:
+        db.session.commit()
+    return len(rows)
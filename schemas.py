@@ -4,9 +4,36 @@ Schémas de validation des données d'entrée pour les API.
 Utilise Pydantic pour une validation stricte et automatique.
 """
 
-from pydantic import BaseModel, EmailStr, HttpUrl, validator, Field
+import re
+
+from pydantic import BaseModel, ConfigDict, EmailStr, HttpUrl, field_validator, Field
 from typing import Optional, Dict, Any
 
+# ==============================================================================
+# CONSTANTES DE VALIDATION (compilées une seule fois)
+# ==============================================================================
+
+# Lettres minuscules, chiffres et tirets, sans tiret en début ou fin
+_SUBDOMAIN_RE = re.compile(r'^[a-z0-9](?:[a-z0-9-]*[a-z0-9])?$')
+
+ALLOWED_TEMPLATES = frozenset({'classic', 'modern', 'luxury'})
+ALLOWED_TIERS = frozenset({'basic', 'pro', 'enterprise'})
+ALLOWED_ROLES = frozenset({'agency_admin', 'seller'})
+
+_TEMPLATE_ERROR = 'Template invalide. Choix possibles : classic, modern, luxury'
+_TIER_ERROR = 'Tier invalide. Choix possibles : basic, pro, enterprise'
+_ROLE_ERROR = 'Rôle invalide. Choix possibles : agency_admin, seller'
+
+
+def _validate_subdomain(v: str) -> str:
+    """Valide un sous-domaine et le retourne en minuscules."""
+    v = v.lower()
+    if not _SUBDOMAIN_RE.match(v):
+        if v.startswith('-') or v.endswith('-'):
+            raise ValueError('Le sous-domaine ne peut pas commencer ou finir par un tiret')
+        raise ValueError('Le sous-domaine ne peut contenir que des lettres, chiffres et tirets')
+    return v
+
 # ==============================================================================
 # SCHÉMAS POUR LES AGENCES
 # ==============================================================================
@@ -40,51 +67,40 @@ class AgencyCreateSchema(BaseModel):
     mail_config: Optional[Dict[str, Any]] = Field(None, description="Configuration email")
     ftp_config: Optional[Dict[str, Any]] = Field(None, description="Configuration FTP/SFTP")
     
-    @validator('subdomain')
+    @field_validator('subdomain')
+    @classmethod
     def subdomain_alphanumeric(cls, v):
         """Vérifie que le subdomain ne contient que des caractères alphanumériques et tirets."""
-        if not v.replace('-', '').isalnum():
-            raise ValueError('Le sous-domaine ne peut contenir que des lettres, chiffres et tirets')
-        if v.startswith('-') or v.endswith('-'):
-            raise ValueError('Le sous-domaine ne peut pas commencer ou finir par un tiret')
-        return v.lower()
+        return _validate_subdomain(v)
     
-    @validator('template_name')
+    @field_validator('template_name')
+    @classmethod
     def template_exists(cls, v):
         """Vérifie que le template existe."""
-        allowed = ['classic', 'modern', 'luxury']
-        if v not in allowed:
-            raise ValueError(f'Template invalide. Choix possibles : {", ".join(allowed)}')
+        if v not in ALLOWED_TEMPLATES:
+            raise ValueError(_TEMPLATE_ERROR)
         return v
     
-    @validator('subscription_tier')
+    @field_validator('subscription_tier')
+    @classmethod
     def tier_valid(cls, v):
         """Vérifie que le tier est valide."""
-        allowed = ['basic', 'pro', 'enterprise']
-        if v not in allowed:
-            raise ValueError(f'Tier invalide. Choix possibles : {", ".join(allowed)}')
+        if v not in ALLOWED_TIERS:
+            raise ValueError(_TIER_ERROR)
         return v
     
-    @validator('mail_config', 'ftp_config')
-    def config_structure(cls, v):
-        """Vérifie la structure minimale des configs."""
-        if v is not None and not isinstance(v, dict):
-            raise ValueError('La configuration doit être un objet JSON valide')
-        return v
-    
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "name": "Voyages Paradis",
-                "subdomain": "voyages-paradis",
-                "contact_email": "contact@voyages-paradis.com",
-                "contact_phone": "+32 2 123 45 67",
-                "primary_color": "#FF6B6B",
-                "template_name": "luxury",
-                "subscription_tier": "pro",
-                "monthly_generation_limit": 500
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "name": "Voyages Paradis",
+            "subdomain": "voyages-paradis",
+            "contact_email": "contact@voyages-paradis.com",
+            "contact_phone": "+32 2 123 45 67",
+            "primary_color": "#FF6B6B",
+            "template_name": "luxury",
+            "subscription_tier": "pro",
+            "monthly_generation_limit": 500
         }
+    })
 
 
 class AgencyUpdateSchema(BaseModel):
@@ -113,42 +129,38 @@ class AgencyUpdateSchema(BaseModel):
     mail_config: Optional[Dict[str, Any]] = None
     ftp_config: Optional[Dict[str, Any]] = None
     
-    @validator('subdomain')
+    @field_validator('subdomain')
+    @classmethod
     def subdomain_alphanumeric(cls, v):
         if v is None:
             return v
-        if not v.replace('-', '').isalnum():
-            raise ValueError('Le sous-domaine ne peut contenir que des lettres, chiffres et tirets')
-        if v.startswith('-') or v.endswith('-'):
-            raise ValueError('Le sous-domaine ne peut pas commencer ou finir par un tiret')
-        return v.lower()
+        return _validate_subdomain(v)
     
-    @validator('template_name')
+    @field_validator('template_name')
+    @classmethod
     def template_exists(cls, v):
         if v is None:
             return v
-        allowed = ['classic', 'modern', 'luxury']
-        if v not in allowed:
-            raise ValueError(f'Template invalide. Choix possibles : {", ".join(allowed)}')
+        if v not in ALLOWED_TEMPLATES:
+            raise ValueError(_TEMPLATE_ERROR)
         return v
     
-    @validator('subscription_tier')
+    @field_validator('subscription_tier')
+    @classmethod
     def tier_valid(cls, v):
         if v is None:
             return v
-        allowed = ['basic', 'pro', 'enterprise']
-        if v not in allowed:
-            raise ValueError(f'Tier invalide. Choix possibles : {", ".join(allowed)}')
+        if v not in ALLOWED_TIERS:
+            raise ValueError(_TIER_ERROR)
         return v
     
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "name": "Voyages Paradis SARL",
-                "primary_color": "#00B4D8",
-                "monthly_generation_limit": 1000
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "name": "Voyages Paradis SARL",
+            "primary_color": "#00B4D8",
+            "monthly_generation_limit": 1000
         }
+    })
 
 
 # ==============================================================================
@@ -166,14 +178,15 @@ class UserCreateSchema(BaseModel):
     margin_percentage: int = Field(80, ge=0, le=100)
     daily_generation_limit: int = Field(5, ge=1, le=10000, description="Limite quotidienne de génération (1-10000)")
     
-    @validator('role')
+    @field_validator('role')
+    @classmethod
     def role_valid(cls, v):
-        allowed = ['agency_admin', 'seller']
-        if v not in allowed:
-            raise ValueError(f'Rôle invalide. Choix possibles : {", ".join(allowed)}')
+        if v not in ALLOWED_ROLES:
+            raise ValueError(_ROLE_ERROR)
         return v
     
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def password_strength(cls, v):
         """Vérifie la force du mot de passe."""
         if len(v) < 8:
@@ -194,16 +207,17 @@ class UserUpdateSchema(BaseModel):
     daily_generation_limit: Optional[int] = Field(None, ge=1, le=10000, description="Limite quotidienne de génération (1-10000)")
     is_active: Optional[bool] = None
     
-    @validator('role')
+    @field_validator('role')
+    @classmethod
     def role_valid(cls, v):
         if v is None:
             return v
-        allowed = ['agency_admin', 'seller']
-        if v not in allowed:
-            raise ValueError(f'Rôle invalide. Choix possibles : {", ".join(allowed)}')
+        if v not in ALLOWED_ROLES:
+            raise ValueError(_ROLE_ERROR)
         return v
     
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def password_strength(cls, v):
         if v is None:
             return v
@@ -4,52 +4,48 @@ Assistant IA pour le parsing de prompts et génération de contenu
 Utilise Google Gemini API pour analyser les demandes en langage naturel
 """
 
-import google.generativeai as genai
+from google import genai
+from google.genai import types
+import asyncio
+import hashlib
 import json
-from typing import Dict, Any, List, Optional
+import logging
+import math
+from functools import lru_cache
+from typing import Dict, Any, Final, List, Literal, Optional
 import re
 
+from pydantic import BaseModel
 
-class AIAssistant:
-    """Gestionnaire d'intelligence artificielle pour l'assistance voyage"""
-    
-    def __init__(self, api_key: str):
-        """
-        Initialise l'assistant IA avec une clé API Gemini
-        
-        Args:
-            api_key: Clé API Google Gemini de l'agence
-        """
-        genai.configure(api_key=api_key)
-        # MODIFIÉ : Utilisation du modèle qui fonctionne pour votre configuration.
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite')
-    
-    def parse_travel_prompt(self, prompt: str) -> Dict[str, Any]:
-        """
-        Parse un prompt en langage naturel et extrait les informations de voyage
-        
-        Args:
-            prompt: Description en langage naturel du voyage
-                    Ex: "Voyage en autocar à Rome, Colisée + Vatican, 100€"
-        
-        Returns:
-            Dict contenant les informations structurées :
-            {
-                "destination": "Rome, Italie",
-                "transport_type": "autocar",
-                "is_day_trip": false,
-                "activities": ["Colisée", "Vatican"],
-                "price": 100,
-                "hotel_name": null,
-                "estimated_duration": 3,
-                "stars": 3,
-                "meal_plan": "petit_dejeuner",
-                "num_people": 2,
-                "departure_city": null
-            }
-        """
-        
-        system_prompt = """
+from utils.cache import get_cache
+
+_log = logging.getLogger(__name__)
+
+# orjson (3 à 5x plus rapide sur ces petits documents) si disponible, sinon json standard
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
+
+# Modèle par défaut : tier rapide, suffisant pour ces sorties JSON courtes
+DEFAULT_MODEL = 'gemini-2.5-flash-lite'
+
+# Durée de conservation des réponses Gemini (mêmes entrées → même réponse)
+RESPONSE_CACHE_TTL = 24 * 3600
+
+# Réponses JSON : Gemini renvoie directement du JSON (sans bloc markdown ni texte autour)
+_JSON_CONFIG = types.GenerateContentConfig(response_mime_type='application/json')
+
+# Instructions et exemples du parsing de prompts : envoyés comme system_instruction,
+# préfixe identique d'un appel à l'autre (éligible au cache implicite de Gemini)
+_PARSE_SYSTEM_PROMPT: Final[str] = """
 Tu es un assistant spécialisé dans l'analyse de demandes de voyages.
 À partir d'une description en langage naturel, extrais et structure les informations.
 
@@ -178,37 +174,528 @@ Output: {
 IMPORTANT : Réponds UNIQUEMENT en JSON valide, sans markdown (pas de ```json), sans texte additionnel.
 Le JSON doit être directement parseable.
 """
+
+# ==============================================================================
+# SCHÉMAS DE SORTIE IMPOSÉS À GEMINI (structured output)
+# ==============================================================================
+
+class ParsedTravelPrompt(BaseModel):
+    """Structure des données extraites d'un prompt de voyage"""
+    destination: str
+    transport_type: Literal['avion', 'train', 'autocar', 'voiture']
+    is_day_trip: bool
+    activities: List[str]
+    price: Optional[float] = None
+    hotel_name: Optional[str] = None
+    estimated_duration: Optional[int] = None
+    departure_city: Optional[str] = None
+    num_people: Optional[int] = None
+    stars: Optional[int] = None
+    meal_plan: Optional[Literal['logement_seul', 'petit_dejeuner', 'demi_pension', 'pension_complete', 'all_in']] = None
+
+
+class ProgramStep(BaseModel):
+    """Étape d'un programme d'excursion"""
+    time: str
+    activity: str
+
+
+# Parsing : sortie JSON conforme au schéma + instructions système
+_PARSE_CONFIG = types.GenerateContentConfig(
+    response_mime_type='application/json',
+    response_schema=ParsedTravelPrompt,
+    system_instruction=_PARSE_SYSTEM_PROMPT
+)
+
+_PROGRAM_CONFIG = types.GenerateContentConfig(
+    response_mime_type='application/json',
+    response_schema=list[ProgramStep]
+)
+
+_SUGGESTIONS_CONFIG = types.GenerateContentConfig(
+    response_mime_type='application/json',
+    response_schema=list[str]
+)
+
+
+# ==============================================================================
+# ANALYSE LOCALE DES PROMPTS SIMPLES (sans appel à Gemini)
+# ==============================================================================
+
+# Destinations connues : nom normalisé + attractions proposées par défaut
+_CITY_GAZETTEER = {
+    'bruges': ('Bruges, Belgique', ['Grand-Place de Bruges', 'Béguinage', 'Canaux']),
+    'gand': ('Gand, Belgique', ['Château des Comtes', 'Cathédrale Saint-Bavon', 'Quai aux Herbes']),
+    'anvers': ('Anvers, Belgique', ['Grand-Place d\'Anvers', 'Cathédrale Notre-Dame', 'Musée MAS']),
+    'paris': ('Paris, France', ['Tour Eiffel', 'Louvre', 'Montmartre']),
+    'lille': ('Lille, France', ['Vieux-Lille', 'Grand-Place de Lille', 'Palais des Beaux-Arts']),
+    'amsterdam': ('Amsterdam, Pays-Bas', ['Rijksmuseum', 'Canaux', 'Maison d\'Anne Frank']),
+    'cologne': ('Cologne, Allemagne', ['Cathédrale de Cologne', 'Vieille ville', 'Musée du Chocolat']),
+    'londres': ('Londres, Royaume-Uni', ['Big Ben', 'Tower Bridge', 'British Museum']),
+    'rome': ('Rome, Italie', ['Colisée', 'Vatican', 'Fontaine de Trevi']),
+    'barcelone': ('Barcelone, Espagne', ['Sagrada Família', 'Parc Güell', 'La Rambla']),
+    'marrakech': ('Marrakech, Maroc', ['Médina de Marrakech', 'Jardin Majorelle', 'Place Jemaa el-Fna']),
+}
+
+_TRANSPORT_KEYWORDS = {
+    'autocar': 'autocar', 'bus': 'autocar',
+    'avion': 'avion', 'vol': 'avion',
+    'train': 'train', 'tgv': 'train', 'thalys': 'train', 'eurostar': 'train',
+    'voiture': 'voiture',
+}
+
+# Ordre important : les formules les plus spécifiques d'abord
+_MEAL_PLAN_KEYWORDS = (
+    ('all inclusive', 'all_in'), ('all-in', 'all_in'), ('all in', 'all_in'), ('tout compris', 'all_in'),
+    ('pension complète', 'pension_complete'),
+    ('demi-pension', 'demi_pension'), ('demi pension', 'demi_pension'),
+    ('petit-déjeuner', 'petit_dejeuner'), ('petit déjeuner', 'petit_dejeuner'),
+    ('logement seul', 'logement_seul'),
+)
+
+_WORD_RE = re.compile(r"[a-zà-ÿ]+")
+_PRICE_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:€|euros?\b)')
+_DURATION_RE = re.compile(r'(\d+)\s*(jours?|nuits?|semaines?)\b')
+_STARS_RE = re.compile(r'([1-5])\s*(?:étoiles?|\*|★)')
+_PEOPLE_RE = re.compile(r'(\d+)\s*personnes\b')
+_DEPARTURE_RE = re.compile(r'\bdepuis\s+([a-zà-ÿ-]+)')
+_DAY_TRIP_RE = re.compile(r"\bexcursion\b|\bjournée\b|\bday trip\b|\b1 jour\b")
+_WEEKEND_RE = re.compile(r'\bweek-?end\b')
+# Éléments que seule l'IA sait interpréter (liste d'activités, nom d'hôtel, visites précises)
+_NEEDS_AI_RE = re.compile(r"\+|\bh[oô]tel\b|\bvisites?\b")
+# Mots sans contenu propre : un prompt qui contient d'autres mots n'est pas entièrement couvert
+_FILLER_WORDS = frozenset((
+    'a', 'à', 'au', 'aux', 'avec', 'chez', 'd', 'dans', 'de', 'des', 'du', 'en', 'et', 'l', 'la',
+    'le', 'les', 'par', 'pour', 'un', 'une', 'vers',
+    'voyage', 'séjour', 'sejour', 'excursion', 'journée', 'jour', 'jours', 'nuit', 'nuits',
+    'semaine', 'semaines', 'personne', 'personnes', 'euro', 'euros', 'prix', 'budget',
+))
+
+
+def _try_fastparse(prompt: str) -> Optional[Dict[str, Any]]:
+    """
+    Analyse locale des prompts simples (destination connue, transport et prix explicites).
+    
+    Args:
+        prompt: Description en langage naturel du voyage
+        
+    Returns:
+        Données structurées (même format que Gemini), ou None si le prompt
+        n'est pas entièrement couvert et doit être confié à l'IA
+    """
+    text = prompt.lower()
+    if _NEEDS_AI_RE.search(text):
+        return None
+    
+    price_match = _PRICE_RE.search(text)
+    if not price_match:
+        return None
+    price = float(price_match.group(1).replace(',', '.'))
+    
+    words = _WORD_RE.findall(text)
+    transports = {_TRANSPORT_KEYWORDS[w] for w in words if w in _TRANSPORT_KEYWORDS}
+    if len(transports) != 1:
+        return None
+    
+    departure_match = _DEPARTURE_RE.search(text)
+    departure = departure_match.group(1) if departure_match else None
+    cities = {w for w in words if w in _CITY_GAZETTEER and w != departure}
+    if len(cities) != 1:
+        return None
+    city = cities.pop()
+    destination, activities = _CITY_GAZETTEER[city]
+    
+    # Tout mot non consommé (activité, lieu précis...) serait ignoré en silence : confier à l'IA
+    remaining = text
+    for pattern in (_PRICE_RE, _DURATION_RE, _STARS_RE, _PEOPLE_RE, _DEPARTURE_RE, _DAY_TRIP_RE, _WEEKEND_RE):
+        remaining = pattern.sub(' ', remaining)
+    for keyword, _plan in _MEAL_PLAN_KEYWORDS:
+        remaining = remaining.replace(keyword, ' ')
+    if any(
+        w != city and w not in _TRANSPORT_KEYWORDS and w not in _FILLER_WORDS
+        for w in _WORD_RE.findall(remaining)
+    ):
+        return None
+    
+    # Excursion d'un jour : mot-clé explicite ou durée de « 1 jour »
+    duration_match = _DURATION_RE.search(text)
+    single_day = duration_match is not None and duration_match.group(1) == '1' and duration_match.group(2) == 'jour'
+    day_trip_hint = bool(_DAY_TRIP_RE.search(text))
+    if day_trip_hint and duration_match and not single_day:
+        # Signaux contradictoires (ex. « excursion de 3 jours ») : laisser trancher l'IA
+        return None
+    is_day_trip = day_trip_hint or single_day
+    if is_day_trip:
+        duration = 0
+    elif duration_match:
+        duration = int(duration_match.group(1)) * (7 if duration_match.group(2).startswith('semaine') else 1)
+    elif _WEEKEND_RE.search(text):
+        duration = 2
+    elif 'semaine' in words:
+        duration = 7
+    else:
+        duration = 3
+    
+    stars = meal_plan = None
+    if not is_day_trip:
+        # Catégorie et formule selon le budget, sauf mention explicite
+        if price < 300:
+            stars, meal_plan = 3, 'petit_dejeuner'
+        elif price <= 600:
+            stars, meal_plan = 3, 'demi_pension'
+        else:
+            stars, meal_plan = 4, 'pension_complete'
+        stars_match = _STARS_RE.search(text)
+        if stars_match:
+            stars = int(stars_match.group(1))
+        meal_plan = next((plan for keyword, plan in _MEAL_PLAN_KEYWORDS if keyword in text), meal_plan)
+    
+    people_match = _PEOPLE_RE.search(text)
+    
+    return {
+        'destination': destination,
+        'transport_type': transports.pop(),
+        'is_day_trip': is_day_trip,
+        'activities': list(activities),
+        'price': price,
+        'hotel_name': None,
+        'estimated_duration': duration,
+        'stars': stars,
+        'meal_plan': meal_plan,
+        'num_people': int(people_match.group(1)) if people_match else 2,
+        'departure_city': departure.capitalize() if departure else None,
+    }
+
+
+_NUMBER_RE = re.compile(r'\d+')
+
+
+# ==============================================================================
+# ESTIMATION LOCALE DES DURÉES DE TRAJET
+# ==============================================================================
+
+# Coordonnées (latitude, longitude) des villes de départ et destinations fréquentes
+_CITY_COORDS = {
+    'bruxelles': (50.85, 4.35), 'bruges': (51.21, 3.22), 'gand': (51.05, 3.72),
+    'anvers': (51.22, 4.40), 'liège': (50.63, 5.57), 'namur': (50.47, 4.87),
+    'charleroi': (50.41, 4.44), 'mons': (50.45, 3.95), 'luxembourg': (49.61, 6.13),
+    'paris': (48.86, 2.35), 'lille': (50.63, 3.06), 'reims': (49.26, 4.03),
+    'strasbourg': (48.57, 7.75), 'lyon': (45.76, 4.84), 'nice': (43.70, 7.27),
+    'amsterdam': (52.37, 4.90), 'rotterdam': (51.92, 4.48), 'maastricht': (50.85, 5.69),
+    'cologne': (50.94, 6.96), 'aix-la-chapelle': (50.78, 6.08), 'berlin': (52.52, 13.40),
+    'londres': (51.51, -0.13), 'rome': (41.90, 12.48), 'florence': (43.77, 11.26),
+    'venise': (45.44, 12.32), 'barcelone': (41.39, 2.17), 'madrid': (40.42, -3.70),
+    'lisbonne': (38.72, -9.14), 'vienne': (48.21, 16.37), 'prague': (50.08, 14.44),
+    'marrakech': (31.63, -7.99),
+}
+
+# Vitesse moyenne (km/h) et facteur de détour par rapport au vol d'oiseau
+_TRANSPORT_SPEED = {
+    'autocar': (70, 1.3),
+    'voiture': (90, 1.3),
+    'train': (200, 1.2),
+    'avion': (700, 1.0),
+}
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance à vol d'oiseau (km) entre deux points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+
+def _estimate_duration_locally(origin: str, destination: str, transport_type: str) -> Optional[int]:
+    """
+    Estime la durée de trajet (minutes) sans appel réseau.
+    
+    Returns:
+        Durée en minutes, ou None si une des villes ou le transport est inconnu
+    """
+    # "Rome, Italie" → "rome"
+    origin_coords = _CITY_COORDS.get(origin.split(',')[0].strip().lower())
+    destination_coords = _CITY_COORDS.get(destination.split(',')[0].strip().lower())
+    speed = _TRANSPORT_SPEED.get(transport_type)
+    if origin_coords is None or destination_coords is None or speed is None:
+        return None
+    
+    kmh, detour = speed
+    distance = _haversine_km(*origin_coords, *destination_coords) * detour
+    return round(distance / kmh * 60)
+
+
+def _trim_json(text: str) -> str:
+    """
+    Isole le JSON d'une réponse (retire un éventuel bloc markdown ou texte autour)
+    en un seul balayage : du premier { ou [ au dernier } ou ].
+    """
+    start = min((i for i in (text.find('{'), text.find('[')) if i != -1), default=-1)
+    if start == -1:
+        return text
+    end = max(text.rfind('}'), text.rfind(']'))
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def _looks_complete(text: str) -> bool:
+    """Vrai si le texte reçu se termine par une fin d'objet ou de liste JSON"""
+    return text.rstrip('`\n\t ').endswith(('}', ']'))
+
+
+# ==============================================================================
+# VALIDATION DES DONNÉES PARSÉES
+# ==============================================================================
+
+# (champ, valeur par défaut si absent)
+_REQUIRED_FIELDS = (('destination', None), ('transport_type', None), ('is_day_trip', False))
+
+_VALID_TRANSPORTS = frozenset({'avion', 'train', 'autocar', 'voiture'})
+_VALID_MEAL_PLANS = frozenset({'logement_seul', 'petit_dejeuner', 'demi_pension', 'pension_complete', 'all_in'})
+
+# (champ, conversion, valeur si la conversion échoue) : appliqué aux valeurs renseignées
+_COERCED_FIELDS = (
+    ('stars', lambda v: max(1, min(5, int(v))), 3),  # Entre 1 et 5
+    ('price', float, None),
+    ('estimated_duration', int, 3),
+    ('num_people', int, 2),
+)
+
+
+# ==============================================================================
+# PROGRAMME PAR DÉFAUT (SECOURS SI L'IA ÉCHOUE)
+# ==============================================================================
+
+# Créneaux (heure de visite, heure de fin) des 3 activités maximum du programme par défaut
+_DEFAULT_ACTIVITY_SLOTS = (('14:00', '15:30'), ('16:00', '17:30'), ('18:00', '19:30'))
+
+
+@lru_cache(maxsize=32)
+def _default_program_skeleton(departure_time: str, return_time: str, departure_address: str) -> tuple:
+    """
+    Parties fixes du programme par défaut (début et fin de journée), calculées une fois
+    par couple d'horaires / adresse de départ.
+
+    Returns:
+        (étapes avant l'arrivée, étapes du retour) sous forme de tuples (heure, activité)
+    """
+    head = (
+        (departure_time, f"Départ de {departure_address}"),
+        ("10:30", "Pause café"),
+    )
+    tail = (
+        ("17:30", f"Départ retour vers {departure_address}"),
+        (return_time, f"Arrivée à {departure_address}"),
+    )
+    return head, tail
+
+
+class AIAssistant:
+    """Gestionnaire d'intelligence artificielle pour l'assistance voyage"""
+    
+    def __init__(self, api_key: str, model_name: str = DEFAULT_MODEL):
+        """
+        Initialise l'assistant IA avec une clé API Gemini
         
-        full_prompt = system_prompt + f"\n\nPrompt utilisateur: {prompt}"
+        Args:
+            api_key: Clé API Google Gemini de l'agence
+            model_name: Modèle Gemini à utiliser
+        """
+        # Client propre à l'agence (pas de configuration globale partagée entre agences)
+        self.client = genai.Client(api_key=api_key)
+        self.model_name = model_name
+    
+    def _generate_stream(self, prompt: str, config: Optional[types.GenerateContentConfig] = None):
+        """Lance une génération en streaming et renvoie l'itérateur des morceaux de réponse"""
+        return self.client.models.generate_content_stream(model=self.model_name, contents=prompt, config=config)
+    
+    async def _agenerate_stream(self, prompt: str, config: Optional[types.GenerateContentConfig] = None):
+        """Version asynchrone de _generate_stream (itérateur asynchrone)"""
+        return await self.client.aio.models.generate_content_stream(model=self.model_name, contents=prompt, config=config)
+    
+    def _cache_key(self, prompt: str, config: Optional[types.GenerateContentConfig] = None) -> str:
+        """Clé de cache d'une réponse : empreinte du modèle, des instructions système et du prompt"""
+        system_instruction = (config.system_instruction if config is not None else None) or ''
+        digest = hashlib.sha256(f"{self.model_name}\n{system_instruction}\n{prompt}".encode('utf-8')).hexdigest()
+        return f"gemini:{digest}"
+    
+    def _stream_text(self, prompt: str) -> str:
+        """
+        Génère une réponse en streaming et renvoie le texte complet (mis en cache s'il n'est pas vide)
         
-        try:
-            response = self.model.generate_content(full_prompt)
-            response_text = response.text.strip()
+        Args:
+            prompt: Prompt envoyé à Gemini
             
-            # Nettoyer la réponse si elle contient des markdown
-            response_text = re.sub(r'^```json\s*', '', response_text)
-            response_text = re.sub(r'\s*```$', '', response_text)
+        Returns:
+            Texte de la réponse (sans espaces en début/fin)
+        """
+        cache = get_cache()
+        cache_key = self._cache_key(prompt)
+        text = cache.get(cache_key)
+        if text is None:
+            text = ''.join(chunk.text or '' for chunk in self._generate_stream(prompt)).strip()
+            # Réponse vide (blocage de sécurité, flux tronqué) : ne pas la figer pour 24 h
+            if text:
+                cache.set(cache_key, text, ttl=RESPONSE_CACHE_TTL)
+        return text
+    
+    def _stream_json(self, prompt: str, config: types.GenerateContentConfig = _JSON_CONFIG) -> Any:
+        """
+        Génère une réponse JSON en streaming (mise en cache).
+        Le JSON est parsé dès qu'il semble complet (se termine par } ou ]) :
+        la fin du flux n'est pas attendue.
+        
+        Args:
+            prompt: Prompt envoyé à Gemini
+            
+        Returns:
+            Données JSON parsées
             
-            # Parser le JSON
-            parsed = json.loads(response_text)
+        Raises:
+            json.JSONDecodeError: Si la réponse complète n'est pas un JSON valide
+                                  (le texte brut est disponible dans e.doc)
+        """
+        cache = get_cache()
+        cache_key = self._cache_key(prompt, config)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _json_loads(cached)
+        
+        parsed = self._read_json_stream(self._generate_stream(prompt, config))
+        cache.set(cache_key, _json_dumps(parsed), ttl=RESPONSE_CACHE_TTL)
+        return parsed
+    
+    @staticmethod
+    def _read_json_stream(chunks) -> Any:
+        """Accumule les morceaux de réponse et parse le JSON dès qu'il est complet"""
+        buffer = []
+        for chunk in chunks:
+            buffer.append(chunk.text or '')
+            text = ''.join(buffer)
+            if _looks_complete(text):
+                try:
+                    return _json_loads(_trim_json(text))
+                except json.JSONDecodeError:
+                    continue  # JSON encore incomplet : attendre la suite
+        
+        return _json_loads(_trim_json(''.join(buffer)))
+    
+    async def _astream_json(self, prompt: str, config: types.GenerateContentConfig = _JSON_CONFIG) -> Any:
+        """
+        Version asynchrone de _stream_json (même cache, même arrêt anticipé)
+        
+        Args:
+            prompt: Prompt envoyé à Gemini
+            
+        Returns:
+            Données JSON parsées
+        """
+        cache = get_cache()
+        cache_key = self._cache_key(prompt, config)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _json_loads(cached)
+        
+        parsed = None
+        buffer = []
+        async for chunk in await self._agenerate_stream(prompt, config):
+            buffer.append(chunk.text or '')
+            text = ''.join(buffer)
+            if _looks_complete(text):
+                try:
+                    parsed = _json_loads(_trim_json(text))
+                    break
+                except json.JSONDecodeError:
+                    continue
+        
+        if parsed is None:
+            parsed = _json_loads(_trim_json(''.join(buffer)))
+        cache.set(cache_key, _json_dumps(parsed), ttl=RESPONSE_CACHE_TTL)
+        return parsed
+    
+    def parse_travel_prompt(self, prompt: str) -> Dict[str, Any]:
+        """
+        Parse un prompt en langage naturel et extrait les informations de voyage
+        
+        Args:
+            prompt: Description en langage naturel du voyage
+                    Ex: "Voyage en autocar à Rome, Colisée + Vatican, 100€"
+        
+        Returns:
+            Dict contenant les informations structurées :
+            {
+                "destination": "Rome, Italie",
+                "transport_type": "autocar",
+                "is_day_trip": false,
+                "activities": ["Colisée", "Vatican"],
+                "price": 100,
+                "hotel_name": null,
+                "estimated_duration": 3,
+                "stars": 3,
+                "meal_plan": "petit_dejeuner",
+                "num_people": 2,
+                "departure_city": null
+            }
+        """
+        
+        # Prompts simples : analyse locale, sans appel réseau
+        fast_result = _try_fastparse(prompt)
+        if fast_result is not None:
+            return self._validate_and_clean_parsed_data(fast_result)
+        
+        try:
+            # Parser le JSON (en streaming) : seule la demande utilisateur accompagne les instructions système
+            parsed = self._stream_json(f"Prompt utilisateur: {prompt}", _PARSE_CONFIG)
             
             # Validation et nettoyage
             return self._validate_and_clean_parsed_data(parsed)
             
         except json.JSONDecodeError as e:
-            print(f"❌ Erreur de parsing JSON: {e}")
-            print(f"Réponse brute: {response.text}")
-            return {
-                "error": "Impossible de parser le prompt. Veuillez reformuler.",
-                "raw_response": response.text,
-                "success": False
-            }
+            return self._parse_error_result(e)
         except Exception as e:
-            print(f"❌ Erreur Gemini API: {e}")
-            return {
-                "error": f"Erreur de l'API IA: {str(e)}",
-                "success": False
-            }
+            return self._api_error_result(e)
+    
+    async def aparse_travel_prompt(self, prompt: str) -> Dict[str, Any]:
+        """
+        Version asynchrone de parse_travel_prompt.
+        Permet d'analyser plusieurs prompts en parallèle avec asyncio.gather().
+        
+        Args:
+            prompt: Description en langage naturel du voyage
+            
+        Returns:
+            Mêmes données structurées que parse_travel_prompt
+        """
+        fast_result = _try_fastparse(prompt)
+        if fast_result is not None:
+            return self._validate_and_clean_parsed_data(fast_result)
+        
+        try:
+            parsed = await self._astream_json(f"Prompt utilisateur: {prompt}", _PARSE_CONFIG)
+            return self._validate_and_clean_parsed_data(parsed)
+            
+        except json.JSONDecodeError as e:
+            return self._parse_error_result(e)
+        except Exception as e:
+            return self._api_error_result(e)
+    
+    @staticmethod
+    def _parse_error_result(e: json.JSONDecodeError) -> Dict[str, Any]:
+        """Résultat renvoyé quand la réponse de l'IA n'est pas un JSON valide"""
+        _log.warning("Erreur de parsing JSON: %s", e)
+        _log.debug("Réponse brute: %s", e.doc)
+        return {
+            "error": "Impossible de parser le prompt. Veuillez reformuler.",
+            "raw_response": e.doc,
+            "success": False
+        }
+    
+    @staticmethod
+    def _api_error_result(e: Exception) -> Dict[str, Any]:
+        """Résultat renvoyé en cas d'erreur de l'API Gemini"""
+        _log.warning("Erreur Gemini API: %s", e, exc_info=True)
+        return {
+            "error": f"Erreur de l'API IA: {str(e)}",
+            "success": False
+        }
     
     def _validate_and_clean_parsed_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -222,52 +709,24 @@ Le JSON doit être directement parseable.
         """
         
         # Champs obligatoires
-        required_fields = ['destination', 'transport_type', 'is_day_trip']
-        for field in required_fields:
-            if field not in data:
-                data[field] = None if field != 'is_day_trip' else False
-        
-        # Validation transport_type
-        valid_transports = ['avion', 'train', 'autocar', 'voiture']
-        if data.get('transport_type') not in valid_transports:
-            data['transport_type'] = 'avion'  # Par défaut
+        for field, default in _REQUIRED_FIELDS:
+            data.setdefault(field, default)
         
-        # Validation meal_plan
-        valid_meal_plans = ['logement_seul', 'petit_dejeuner', 'demi_pension', 
-                           'pension_complete', 'all_in']
-        if data.get('meal_plan') and data['meal_plan'] not in valid_meal_plans:
+        # Valeurs énumérées
+        if data.get('transport_type') not in _VALID_TRANSPORTS:
+            data['transport_type'] = 'avion'  # Par défaut
+        if data.get('meal_plan') and data['meal_plan'] not in _VALID_MEAL_PLANS:
             data['meal_plan'] = None
         
-        # Validation stars
-        if data.get('stars'):
-            try:
-                stars = int(data['stars'])
-                data['stars'] = max(1, min(5, stars))  # Entre 1 et 5
-            except (ValueError, TypeError):
-                data['stars'] = 3  # Par défaut
-        
-        # Validation price
-        if data.get('price'):
-            try:
-                data['price'] = float(data['price'])
-            except (ValueError, TypeError):
-                data['price'] = None
-        
-        # Validation estimated_duration
-        if data.get('estimated_duration'):
-            try:
-                data['estimated_duration'] = int(data['estimated_duration'])
-            except (ValueError, TypeError):
-                data['estimated_duration'] = 3
-        
-        # Validation num_people
-        if data.get('num_people'):
-            try:
-                data['num_people'] = int(data['num_people'])
-            except (ValueError, TypeError):
-                data['num_people'] = 2
-        else:
-            data['num_people'] = 2
+        # Champs numériques : conversion en un seul passage sur la table
+        data['num_people'] = data.get('num_people') or 2
+        for field, coerce, default in _COERCED_FIELDS:
+            value = data.get(field)
+            if value:
+                try:
+                    data[field] = coerce(value)
+                except (ValueError, TypeError):
+                    data[field] = default
         
         # Validation activities (doit être une liste)
         if not isinstance(data.get('activities'), list):
@@ -349,14 +808,7 @@ Réponds UNIQUEMENT en JSON valide, sans markdown, sans texte additionnel.
 """
         
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Nettoyer la réponse
-            response_text = re.sub(r'^```json\s*', '', response_text)
-            response_text = re.sub(r'\s*```$', '', response_text)
-            
-            program = json.loads(response_text)
+            program = self._stream_json(prompt, _PROGRAM_CONFIG)
             
             # Validation : doit être une liste
             if not isinstance(program, list):
@@ -370,8 +822,7 @@ Réponds UNIQUEMENT en JSON valide, sans markdown, sans texte additionnel.
             return program
             
         except (json.JSONDecodeError, ValueError) as e:
-            print(f"❌ Erreur parsing programme: {e}")
-            print(f"Réponse brute: {response.text}")
+            _log.warning("Erreur parsing programme: %s", e)
             
             # Programme par défaut en cas d'erreur
             return self._generate_default_program(
@@ -382,7 +833,7 @@ Réponds UNIQUEMENT en JSON valide, sans markdown, sans texte additionnel.
                 departure_address
             )
         except Exception as e:
-            print(f"❌ Erreur Gemini API: {e}")
+            _log.warning("Erreur Gemini API: %s", e, exc_info=True)
             return self._generate_default_program(
                 destination, 
                 activities, 
@@ -404,30 +855,22 @@ Réponds UNIQUEMENT en JSON valide, sans markdown, sans texte additionnel.
             Programme basique mais fonctionnel
         """
         
-        program = [
-            {"time": departure_time, "activity": f"Départ de {departure_address}"},
-            {"time": "10:30", "activity": "Pause café"},
-            {"time": "12:00", "activity": f"Arrivée à {destination}"},
-            {"time": "12:30", "activity": "Déjeuner libre"},
-        ]
-        
-        # Ajouter les activités
+        head, tail = _default_program_skeleton(departure_time, return_time, departure_address)
+
+        program = [{"time": time, "activity": activity} for time, activity in head]
+        program.append({"time": "12:00", "activity": f"Arrivée à {destination}"})
+        program.append({"time": "12:30", "activity": "Déjeuner libre"})
+
+        # Ajouter les activités (max 3)
         current_time = "14:00"
-        for i, activity in enumerate(activities[:3]):  # Max 3 activités
-            hour = 14 + (i * 2)
-            program.append({
-                "time": f"{hour:02d}:00",
-                "activity": f"Visite de {activity}"
-            })
-            current_time = f"{hour + 1:02d}:30"
-        
+        for activity, (start, end) in zip(activities, _DEFAULT_ACTIVITY_SLOTS):
+            program.append({"time": start, "activity": f"Visite de {activity}"})
+            current_time = end
+
         # Temps libre et retour
-        program.extend([
-            {"time": current_time, "activity": "Temps libre"},
-            {"time": "17:30", "activity": f"Départ retour vers {departure_address}"},
-            {"time": return_time, "activity": f"Arrivée à {departure_address}"}
-        ])
-        
+        program.append({"time": current_time, "activity": "Temps libre"})
+        program.extend({"time": time, "activity": activity} for time, activity in tail)
+
         return program
     
     def suggest_activities(self, destination: str, max_suggestions: int = 5) -> List[str]:
@@ -455,14 +898,7 @@ Destination : {destination}
 """
         
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Nettoyer
-            response_text = re.sub(r'^```json\s*', '', response_text)
-            response_text = re.sub(r'\s*```$', '', response_text)
-            
-            suggestions = json.loads(response_text)
+            suggestions = self._stream_json(prompt, _SUGGESTIONS_CONFIG)
             
             if isinstance(suggestions, list):
                 return suggestions[:max_suggestions]
@@ -470,7 +906,7 @@ Destination : {destination}
                 return []
                 
         except Exception as e:
-            print(f"❌ Erreur suggestions: {e}")
+            _log.warning("Erreur suggestions: %s", e, exc_info=True)
             return []
     
     def estimate_travel_duration(self, 
@@ -489,6 +925,11 @@ Destination : {destination}
             Durée estimée en minutes
         """
         
+        # Villes connues : calcul local (distance à vol d'oiseau + vitesse moyenne)
+        local_estimate = _estimate_duration_locally(origin, destination, transport_type)
+        if local_estimate is not None:
+            return local_estimate
+        
         prompt = f"""
 Estime la durée de trajet en {transport_type} de {origin} à {destination}.
 
@@ -504,16 +945,15 @@ Pas de texte, pas de markdown, juste le nombre.
 """
         
         try:
-            response = self.model.generate_content(prompt)
-            duration_str = response.text.strip()
+            duration_str = self._stream_text(prompt)
             
             # Extraire le nombre
-            duration = int(re.search(r'\d+', duration_str).group())
+            duration = int(_NUMBER_RE.search(duration_str).group())
             
             return duration
             
         except Exception as e:
-            print(f"❌ Erreur estimation durée: {e}")
+            _log.warning("Erreur estimation durée: %s", e, exc_info=True)
             # Durée par défaut selon le transport
             defaults = {
                 'autocar': 480,  # 8h
@@ -528,6 +968,21 @@ Pas de texte, pas de markdown, juste le nombre.
 # FONCTIONS UTILITAIRES GLOBALES
 # ==============================================================================
 
+@lru_cache(maxsize=64)
+def _get_assistant(api_key: str, model_name: str = DEFAULT_MODEL) -> AIAssistant:
+    """
+    Retourne l'assistant associé à une clé API (une instance par agence, réutilisée)
+    
+    Args:
+        api_key: Clé API Gemini
+        model_name: Modèle Gemini à utiliser
+        
+    Returns:
+        AIAssistant instance
+    """
+    return AIAssistant(api_key, model_name)
+
+
 def parse_prompt(prompt: str, gemini_api_key: str) -> Dict[str, Any]:
     """
     Fonction raccourci pour parser un prompt
@@ -539,8 +994,27 @@ def parse_prompt(prompt: str, gemini_api_key: str) -> Dict[str, Any]:
     Returns:
         Données structurées du voyage
     """
+    return _get_assistant(gemini_api_key).parse_travel_prompt(prompt)
+
+
+def parse_prompts(prompts: List[str], gemini_api_key: str) -> List[Dict[str, Any]]:
+    """
+    Parse plusieurs prompts en parallèle (requêtes Gemini concurrentes)
+    
+    Args:
+        prompts: Descriptions de voyages
+        gemini_api_key: Clé API Gemini
+        
+    Returns:
+        Données structurées, dans l'ordre des prompts
+    """
+    # Instance dédiée : le client asynchrone reste lié à la boucle créée par asyncio.run()
     assistant = AIAssistant(gemini_api_key)
-    return assistant.parse_travel_prompt(prompt)
+    
+    async def _parse_all():
+        return await asyncio.gather(*(assistant.aparse_travel_prompt(p) for p in prompts))
+    
+    return asyncio.run(_parse_all())
 
 
 def generate_program(destination: str,
@@ -563,8 +1037,7 @@ def generate_program(destination: str,
     Returns:
         Programme horaire détaillé
     """
-    assistant = AIAssistant(gemini_api_key)
-    return assistant.generate_day_trip_program(
+    return _get_assistant(gemini_api_key).generate_day_trip_program(
         destination,
         activities,
         departure_time,
@@ -580,11 +1053,20 @@ def generate_program(destination: str,
 if __name__ == "__main__":
     """
     Tests du service AI Assistant
-    Lancez : python services/ai_assistant.py
+    Lancez depuis la racine du projet : python -m services.ai_assistant
     """
     
     import os
     
+    # Test 0 : analyse locale (sans appel à Gemini)
+    day_trip = _try_fastparse("Excursion de 1 jour à Bruges en autocar, 50€")
+    assert day_trip is not None and day_trip['is_day_trip'] is True, day_trip
+    assert day_trip['estimated_duration'] == 0 and day_trip['stars'] is None and day_trip['meal_plan'] is None, day_trip
+    assert _try_fastparse("Excursion de 3 jours à Bruges en autocar, 300€") is None
+    assert _try_fastparse("Paris en train, 400€, avec Disneyland et croisière sur la Seine") is None
+    assert _try_fastparse("Rome en avion 800€ pour voir le Vatican et les musées du Capitole, 5 jours") is None
+    print("✅ Analyse locale : excursion d'un jour détectée, prompts non couverts confiés à l'IA")
+    
     # Récupérer la clé depuis l'environnement
     API_KEY = os.environ.get('GOOGLE_GEMINI_API_KEY')
     
@@ -606,9 +1088,10 @@ if __name__ == "__main__":
         "Séjour all-in Marrakech, 5★, vol Bruxelles, 600€"
     ]
     
-    for prompt in test_prompts:
+    # Les prompts sont analysés en parallèle
+    results = parse_prompts(test_prompts, API_KEY)
+    for prompt, result in zip(test_prompts, results):
         print(f"\n📝 Prompt: {prompt}")
-        result = assistant.parse_travel_prompt(prompt)
         print(f"✅ Résultat: {json.dumps(result, indent=2, ensure_ascii=False)}")
     
     # Test 2 : Génération de programme
@@ -4,44 +4,164 @@ Rassemble les données depuis les APIs externes (Google Places, YouTube, etc.)
 pour enrichir les fiches de voyage.
 """
 
+import atexit
+import json
+import logging
+import random
+import threading
+import time
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any, List
+from urllib.parse import urlencode
+from urllib3.util.retry import Retry
+
+from utils.cache import get_cache
+
+_log = logging.getLogger(__name__)
+
+# orjson (plus rapide, lit directement les octets de la réponse) si disponible, sinon json standard
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
+
+
+PLACE_DETAILS_URL = 'https://maps.googleapis.com/maps/api/place/details/json'
+PLACE_PHOTO_URL = 'https://maps.googleapis.com/maps/api/place/photo'
+YOUTUBE_SEARCH_URL = 'https://www.googleapis.com/youtube/v3/search'
+
+# Session HTTP partagée : connexions keep-alive réutilisées entre les appels (pas de nouveau handshake TLS),
+# avec quelques nouvelles tentatives sur les erreurs transitoires de Google (quota, 5xx)
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+))
+atexit.register(_SESSION.close)
+
+# Pool de threads partagé entre les requêtes (évite de créer et détruire des threads à chaque aperçu)
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='api-gatherer')
+
+# Durée de conservation des réponses (données publiques, peu volatiles) :
+# les fiches Google Places changent rarement, les résultats de recherche YouTube un peu plus souvent
+PLACE_DETAILS_CACHE_TTL = 7 * 24 * 3600
+YOUTUBE_CACHE_TTL = 24 * 3600
+
+# Statuts Google Places temporaires (quota par seconde dépassé, erreur serveur) : la requête peut être rejouée
+_PLACES_TRANSIENT_STATUSES = frozenset({'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'})
+PLACES_MAX_ATTEMPTS = 3
+
+# Requêtes en cours, par clé de cache : les appels identiques simultanés partagent le même résultat
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _coalesced(cache_key: str, ttl: int, fetch, *args):
+    """
+    Exécute `fetch(*args)` une seule fois pour une clé donnée :
+    - résultat servi depuis le cache s'il a été obtenu il y a moins de `ttl` secondes
+    - si le même appel est déjà en cours dans un autre thread, on attend son résultat
+    Les résultats vides (erreur API) ne sont pas mis en cache.
+    """
+    cache = get_cache()
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return _json_loads(cached)
+
+    with _inflight_lock:
+        future = _inflight.get(cache_key)
+        is_owner = future is None
+        if is_owner:
+            future = _inflight[cache_key] = Future()
+
+    if not is_owner:
+        return future.result()
+
+    try:
+        result = fetch(*args)
+        future.set_result(result)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+
+    if result:
+        cache.set(cache_key, _json_dumps(result), ttl=ttl)
+    return result
 
 
 def _get_place_details(place_id: str, api_key: str) -> Dict[str, Any]:
     """
-    Récupère les détails d'un lieu depuis l'API Google Places.
+    Récupère les détails d'un lieu depuis l'API Google Places (avec cache et dédoublonnage).
     """
     if not place_id or not api_key:
         return {}
+    return _coalesced(
+        f"places:details:{place_id}", PLACE_DETAILS_CACHE_TTL,
+        _fetch_place_details, place_id, api_key
+    )
 
-    url = 'https://maps.googleapis.com/maps/api/place/details/json'
+
+def _fetch_place_details(place_id: str, api_key: str) -> Dict[str, Any]:
+    """Appel réseau à l'API Google Places Details"""
     params = {
         'place_id': place_id,
         'fields': 'name,photos,rating,user_ratings_total,website,formatted_phone_number',
         'key': api_key,
         'language': 'fr'
     }
-    try:
-        response = requests.get(url, params=params, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        return data.get('result', {})
-    except requests.RequestException as e:
-        print(f"❌ Erreur API Google Place Details: {e}")
-        return {}
+    # Les erreurs HTTP (429, 5xx) sont rejouées par la session ; Google Places signale aussi
+    # ses limites de débit dans un statut JSON (réponse HTTP 200), rejoué ici avec un délai croissant
+    for attempt in range(PLACES_MAX_ATTEMPTS):
+        try:
+            response = _SESSION.get(PLACE_DETAILS_URL, params=params, timeout=5)
+            response.raise_for_status()
+            data = _json_loads(response.content)
+        except (requests.RequestException, ValueError) as e:
+            _log.warning("Erreur API Google Place Details: %s", e)
+            return {}
+
+        status = data.get('status')
+        if status not in _PLACES_TRANSIENT_STATUSES or attempt == PLACES_MAX_ATTEMPTS - 1:
+            break
+        time.sleep(0.2 * 2 ** attempt + random.uniform(0, 0.1))
+
+    if status != 'OK':
+        _log.warning("Statut Google Place Details inattendu pour %s: %s", place_id, status)
+    return data.get('result', {})
 
 
 def _get_youtube_videos(query: str, api_key: str, max_results: int = 2) -> List[Dict[str, str]]:
     """
-    Recherche des vidéos sur YouTube.
+    Recherche des vidéos sur YouTube (avec cache et dédoublonnage).
     """
     if not query or not api_key:
         return []
+    normalized_query = ' '.join(query.lower().split())
+    return _coalesced(
+        f"youtube:search:{max_results}:{normalized_query}", YOUTUBE_CACHE_TTL,
+        _fetch_youtube_videos, query, api_key, max_results
+    )
+
 
-    url = 'https://www.googleapis.com/youtube/v3/search'
+def _fetch_youtube_videos(query: str, api_key: str, max_results: int) -> List[Dict[str, str]]:
+    """Appel réseau à l'API YouTube Search"""
     params = {
         'part': 'snippet',
+        # Ne demander que les champs réellement utilisés (réponse JSON bien plus légère)
+        'fields': 'items(id/videoId,snippet(title,thumbnails/high/url))',
         'q': f"voyage {query}",
         'type': 'video',
         'videoEmbeddable': 'true',
@@ -49,23 +169,34 @@ def _get_youtube_videos(query: str, api_key: str, max_results: int = 2) -> List[
         'maxResults': max_results
     }
     try:
-        response = requests.get(url, params=params, timeout=5)
+        response = _SESSION.get(YOUTUBE_SEARCH_URL, params=params, timeout=5)
         response.raise_for_status()
-        data = response.json()
-        
-        videos = []
-        for item in data.get('items', []):
-            videos.append({
+        data = _json_loads(response.content)
+        return [
+            {
                 'id': item['id']['videoId'],
                 'title': item['snippet']['title'],
                 'thumbnail': item['snippet']['thumbnails']['high']['url']
-            })
-        return videos
-    except requests.RequestException as e:
-        print(f"❌ Erreur API YouTube: {e}")
+            }
+            for item in data.get('items', ())
+        ]
+    except (requests.RequestException, ValueError) as e:
+        _log.warning("Erreur API YouTube: %s", e)
         return []
 
 
+def _price_to_cents(value) -> int:
+    """
+    Convertit un prix saisi (nombre ou texte, virgule décimale acceptée) en centimes, sans
+    passer par un float. Retourne 0 si le prix est absent ou invalide.
+    """
+    try:
+        price = Decimal(str(value or 0).strip().replace(',', '.'))
+        return int((price * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):  # Texte non numérique, NaN, infini
+        return 0
+
+
 def gather_trip_data(form_data: Dict[str, Any], agency_config: Dict[str, Any]) -> Dict[str, Any]:
     """
     Point d'entrée pour collecter toutes les données nécessaires à la fiche de voyage.
@@ -87,23 +218,43 @@ def gather_trip_data(form_data: Dict[str, Any], agency_config: Dict[str, Any]) -
         'destination_info': {}
     }
 
-    # 1. Récupérer les informations de l'hôtel via Google Places
+    # Les appels Google Places et YouTube sont indépendants : lancés en parallèle
     hotel_place_id = form_data.get('hotel_place_id')
+    destination = form_data.get('destination')
+    tasks = []
     if hotel_place_id and google_api_key:
-        hotel_details = _get_place_details(hotel_place_id, google_api_key)
-        if hotel_details:
-            api_data['hotel_info'] = {
-                'rating': hotel_details.get('rating'),
-                'user_ratings_total': hotel_details.get('user_ratings_total'),
-                'website': hotel_details.get('website'),
-                'phone': hotel_details.get('formatted_phone_number')
-            }
-            
-            # Extraire les URLs des photos
-            photo_refs = [p['photo_reference'] for p in hotel_details.get('photos', [])]
-            for ref in photo_refs[:6]: # Limiter à 6 photos
-                photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=1200&photoreference={ref}&key={google_api_key}"
-                api_data['photos'].append({'url': photo_url})
+        tasks.append(('hotel', _get_place_details, (hotel_place_id, google_api_key)))
+    if destination and youtube_api_key:
+        tasks.append(('videos', _get_youtube_videos, (destination, youtube_api_key)))
+    
+    # Chaque appel est isolé : une API en panne n'empêche pas d'utiliser les autres résultats
+    results = {}
+    enrichment_errors = []
+    if tasks:
+        futures = {name: _EXECUTOR.submit(fn, *args) for name, fn, args in tasks}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                _log.warning("Erreur d'enrichissement (%s): %s", name, e, exc_info=True)
+                enrichment_errors.append(f"{name}: {e}")
+
+    # 1. Informations de l'hôtel via Google Places
+    hotel_details = results.get('hotel')
+    if hotel_details:
+        api_data['hotel_info'] = {
+            'rating': hotel_details.get('rating'),
+            'user_ratings_total': hotel_details.get('user_ratings_total'),
+            'website': hotel_details.get('website'),
+            'phone': hotel_details.get('formatted_phone_number')
+        }
+        
+        # Extraire les URLs des photos (limitées à 6, paramètres encodés proprement)
+        photo_refs = [p['photo_reference'] for p in hotel_details.get('photos', ())[:6]]
+        api_data['photos'] = [
+            {'url': f"{PLACE_PHOTO_URL}?{urlencode({'maxwidth': 1200, 'photoreference': ref, 'key': google_api_key})}"}
+            for ref in photo_refs
+        ]
 
     # Si aucune photo d'hôtel, utiliser des placeholders
     if not api_data['photos']:
@@ -111,24 +262,25 @@ def gather_trip_data(form_data: Dict[str, Any], agency_config: Dict[str, Any]) -
             {'url': f'https://via.placeholder.com/800x600?text={form_data.get("destination", "Voyage")}'}
         ]
 
-    # 2. Récupérer des vidéos de la destination sur YouTube
-    destination = form_data.get('destination')
-    if destination and youtube_api_key:
-        api_data['videos'] = _get_youtube_videos(destination, youtube_api_key)
+    # 2. Vidéos de la destination sur YouTube
+    if 'videos' in results:
+        api_data['videos'] = results['videos']
 
-    # 3. Calculer les marges (logique simple pour l'instant)
-    pack_price = float(form_data.get('pack_price', 0))
-    # On estime un coût B2B à 70% du prix de vente pour la démo
-    total_b2b = pack_price * 0.7 
-    margin = pack_price - total_b2b
-    # On estime un prix public 15% plus cher que notre prix de vente
-    total_b2c = pack_price * 1.15
-    savings = total_b2c - pack_price
+    # 3. Calculer les marges (logique simple pour l'instant), en centimes pour rester exact
+    pack_price_cents = _price_to_cents(form_data.get('pack_price'))
+    if pack_price_cents:
+        # On estime un coût B2B à 70% du prix de vente pour la démo : marge de 30%
+        margin = pack_price_cents * 3 // 1000
+        # On estime un prix public 15% plus cher que notre prix de vente
+        savings = pack_price_cents * 3 // 2000
+    else:
+        margin = savings = 0
 
     return {
         'success': True,
         'form_data': form_data,
         'api_data': api_data,
-        'margin': int(margin),
-        'savings': int(savings)
+        'margin': margin,
+        'savings': savings,
+        'enrichment_errors': enrichment_errors
     }
\ No newline at end of file
@@ -2,8 +2,97 @@
 """
 Service d'envoi d'emails, capable de gérer des configurations SMTP par agence.
 """
-from flask_mail import Mail, Message
-from typing import Dict, Any
+import atexit
+import logging
+import smtplib
+import threading
+from contextlib import contextmanager
+from flask_mail import Mail, Message, sanitize_address, sanitize_addresses
+from typing import Dict, Any, List, Tuple
+
+_log = logging.getLogger(__name__)
+
+
+# ==============================================================================
+# POOL DE CONNEXIONS SMTP PAR AGENCE
+# ==============================================================================
+
+# Connexions inactives par (serveur, port, utilisateur) : évite DNS + TCP + STARTTLS + AUTH à chaque email
+_SMTP_POOL_SIZE = 2
+_smtp_pool: Dict[Tuple[str, int, str], List[smtplib.SMTP]] = {}
+_smtp_lock = threading.Lock()
+
+
+def _open_smtp(agency_mail_config: Dict[str, Any]) -> smtplib.SMTP:
+    """Ouvre et authentifie une connexion SMTP avec la configuration de l'agence."""
+    server = agency_mail_config['server']
+    port = int(agency_mail_config['port'])
+    if agency_mail_config.get('use_ssl', False):
+        smtp = smtplib.SMTP_SSL(server, port, timeout=10)
+    else:
+        smtp = smtplib.SMTP(server, port, timeout=10)
+        if agency_mail_config.get('use_tls', True):
+            smtp.starttls()
+    smtp.login(agency_mail_config['username'], agency_mail_config['password'])
+    return smtp
+
+
+def _close_smtp(smtp: smtplib.SMTP):
+    try:
+        smtp.quit()
+    except smtplib.SMTPException:
+        smtp.close()
+    except OSError:
+        pass
+
+
+@contextmanager
+def _smtp_connection(agency_mail_config: Dict[str, Any]):
+    """
+    Fournit une connexion SMTP authentifiée pour l'agence, réutilisée depuis le pool si elle
+    répond encore (NOOP). Elle est rendue au pool en cas de succès, fermée en cas d'erreur.
+    """
+    key = (agency_mail_config['server'], int(agency_mail_config['port']), agency_mail_config['username'])
+
+    smtp = None
+    while smtp is None:
+        with _smtp_lock:
+            idle = _smtp_pool.get(key)
+            candidate = idle.pop() if idle else None
+        if candidate is None:
+            smtp = _open_smtp(agency_mail_config)
+            break
+        try:
+            if candidate.noop()[0] == 250:
+                smtp = candidate
+                break
+        except (smtplib.SMTPException, OSError):
+            pass
+        _close_smtp(candidate)
+
+    try:
+        yield smtp
+    except Exception:
+        _close_smtp(smtp)
+        raise
+    else:
+        with _smtp_lock:
+            idle = _smtp_pool.setdefault(key, [])
+            if len(idle) < _SMTP_POOL_SIZE:
+                idle.append(smtp)
+                smtp = None
+        if smtp is not None:
+            _close_smtp(smtp)
+
+
+@atexit.register
+def close_smtp_connections():
+    """Ferme proprement les connexions SMTP inactives (arrêt du processus)."""
+    with _smtp_lock:
+        connections = [smtp for idle in _smtp_pool.values() for smtp in idle]
+        _smtp_pool.clear()
+    for smtp in connections:
+        _close_smtp(smtp)
 
 
 def send_manual_payment_email(
@@ -43,23 +132,8 @@ def send_manual_payment_email(
     )
 
     # Utiliser la configuration de l'agence si elle est complète, sinon la config globale
-    mail_to_use = app_mail
     sender = agency_mail_config.get('sender') or app_mail.default_sender
-
-    if all(k in agency_mail_config for k in ['server', 'port', 'username', 'password']):
-        # Créer une instance Mail temporaire avec la configuration de l'agence
-        temp_mail = Mail()
-        temp_mail.init_app(app_mail.app)  # Utilise le contexte de l'app principale
-        
-        # Appliquer la config de l'agence
-        app_mail.app.config['MAIL_SERVER'] = agency_mail_config['server']
-        app_mail.app.config['MAIL_PORT'] = int(agency_mail_config['port'])
-        app_mail.app.config['MAIL_USERNAME'] = agency_mail_config['username']
-        app_mail.app.config['MAIL_PASSWORD'] = agency_mail_config['password']
-        app_mail.app.config['MAIL_USE_TLS'] = agency_mail_config.get('use_tls', True)
-        app_mail.app.config['MAIL_USE_SSL'] = agency_mail_config.get('use_ssl', False)
-        
-        mail_to_use = temp_mail
+    use_agency_smtp = all(k in agency_mail_config for k in ['server', 'port', 'username', 'password'])
 
     # Créer et envoyer le message
     msg = Message(
@@ -70,9 +144,14 @@ def send_manual_payment_email(
     msg.body = body
 
     try:
-        mail_to_use.send(msg)
-        print(f"✅ Email de paiement manuel envoyé à {client.email}")
+        if use_agency_smtp:
+            # Connexion SMTP de l'agence (poolée), sans toucher à la configuration globale de l'app
+            with _smtp_connection(agency_mail_config) as smtp:
+                smtp.sendmail(sanitize_address(msg.sender), list(sanitize_addresses(msg.send_to)), msg.as_bytes())
+        else:
+            app_mail.send(msg)
+        _log.info("Email de paiement manuel envoyé à %s", client.email)
     except Exception as e:
-        print(f"❌ Erreur lors de l'envoi de l'email: {e}")
+        _log.exception("Erreur lors de l'envoi de l'email: %s", e)
         # Ne pas bloquer le flux utilisateur, mais logger l'erreur est important
-        raise
\ No newline at end of file
+        raise
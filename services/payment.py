@@ -2,13 +2,64 @@
 """
 Service de gestion des paiements avec Stripe.
 """
+import hashlib
+import logging
 import stripe
 from typing import Dict
 
+from utils.cache import get_cache
+
+_log = logging.getLogger(__name__)
+
+
+# Les appels réseau échoués (timeouts, 5xx, 429) sont rejoués par le SDK Stripe,
+# avec des clés d'idempotence : pas de doublon de produit ou de lien
+stripe.max_network_retries = 2
+
+# Un prix Stripe (produit + montant) peut servir à plusieurs liens de paiement
+PRICE_CACHE_TTL = 30 * 24 * 3600
+
+
+def _price_cache_key(stripe_api_key: str, trip_name: str, amount: int) -> str:
+    """Clé de cache d'un prix : propre au compte Stripe (la clé API n'est pas stockée en clair)."""
+    account = hashlib.sha256(stripe_api_key.encode('utf-8')).hexdigest()[:16]
+    digest = hashlib.sha256(f"{trip_name}|{amount}".encode('utf-8')).hexdigest()
+    return f"stripe_price:{account}:{digest}"
+
+
+def _create_price(trip_name: str, amount: int, stripe_api_key: str) -> str:
+    """Crée un produit et son prix sur Stripe, et retourne l'identifiant du prix."""
+    # 1. Créer un produit sur Stripe pour ce voyage
+    product = stripe.Product.create(name=f"Acompte - {trip_name}", api_key=stripe_api_key)
+
+    # 2. Créer un prix pour ce produit
+    price = stripe.Price.create(
+        product=product.id,
+        unit_amount=amount,
+        currency='eur',
+        api_key=stripe_api_key,
+    )
+    return price.id
+
+
+def _create_payment_link(price_id: str, stripe_api_key: str, success_url: str) -> str:
+    """Crée un lien de paiement pour un prix existant."""
+    payment_link = stripe.PaymentLink.create(
+        line_items=[{"price": price_id, "quantity": 1}],
+        after_completion={
+            'type': 'redirect',
+            'redirect': {'url': success_url},
+        },
+        api_key=stripe_api_key,
+    )
+    return payment_link.url
+
 
 def create_stripe_payment_link(trip_name: str, amount: int, stripe_api_key: str, success_url: str) -> str:
     """
-    Crée un produit, un prix et un lien de paiement dans Stripe.
+    Crée un lien de paiement dans Stripe.
+    Le produit et le prix sont réutilisés pour un même voyage et un même montant :
+    seul le lien de paiement est alors créé (1 appel Stripe au lieu de 3).
 
     Args:
         trip_name (str): Le nom du voyage, qui sera le nom du produit sur Stripe.
@@ -26,30 +77,24 @@ def create_stripe_payment_link(trip_name: str, amount: int, stripe_api_key: str,
     if not stripe_api_key:
         raise ValueError("La clé API Stripe est manquante.")
 
-    stripe.api_key = stripe_api_key
+    cache = get_cache()
+    cache_key = _price_cache_key(stripe_api_key, trip_name, amount)
 
     try:
-        # 1. Créer un produit sur Stripe pour ce voyage
-        product = stripe.Product.create(name=f"Acompte - {trip_name}")
+        price_id = cache.get(cache_key)
+        if price_id is not None:
+            try:
+                return _create_payment_link(price_id, stripe_api_key, success_url)
+            except stripe.error.InvalidRequestError:
+                # Prix archivé ou supprimé depuis le tableau de bord Stripe : le recréer
+                cache.delete(cache_key)
 
-        # 2. Créer un prix pour ce produit
-        price = stripe.Price.create(
-            product=product.id,
-            unit_amount=amount,
-            currency='eur',
-        )
+        price_id = _create_price(trip_name, amount, stripe_api_key)
+        cache.set(cache_key, price_id, ttl=PRICE_CACHE_TTL)
 
         # 3. Créer un lien de paiement pour ce prix
-        payment_link = stripe.PaymentLink.create(
-            line_items=[{"price": price.id, "quantity": 1}],
-            after_completion={
-                'type': 'redirect',
-                'redirect': {'url': success_url},
-            },
-        )
-
-        return payment_link.url
+        return _create_payment_link(price_id, stripe_api_key, success_url)
 
     except Exception as e:
-        print(f"❌ Erreur de création du lien de paiement Stripe: {e}")
-        raise
\ No newline at end of file
+        _log.exception("Erreur de création du lien de paiement Stripe: %s", e)
+        raise
@@ -4,10 +4,201 @@ Service de publication des fiches de voyage sur des serveurs externes.
 Pour l'instant, supporte uniquement FTP.
 """
 
+import atexit
 import ftplib
-import tempfile
-import os
-from typing import Dict
+import io
+import logging
+import queue
+import socket
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Set, Tuple
+
+_log = logging.getLogger(__name__)
+
+
+# Taille des blocs envoyés lors d'un STOR
+FTP_BLOCKSIZE = 64 * 1024
+
+
+# Tampon d'envoi des connexions de données (permet d'avoir plus de données en vol sur les liens lents)
+FTP_SNDBUF = 256 * 1024
+
+
+class _TunedFTP(ftplib.FTP):
+    """
+    Client FTP avec des sockets réglés pour la publication :
+    keep-alive (détection des connexions mortes) et TCP_NODELAY (pas d'attente de Nagle)
+    sur la connexion de contrôle comme sur les connexions de données.
+    """
+
+    @staticmethod
+    def _tune(sock):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def connect(self, *args, **kwargs):
+        welcome = super().connect(*args, **kwargs)
+        self._tune(self.sock)
+        return welcome
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = super().ntransfercmd(cmd, rest)
+        self._tune(conn)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, FTP_SNDBUF)
+        return conn, size
+
+
+# ==============================================================================
+# POOL DE CONNEXIONS FTP
+# ==============================================================================
+
+class FTPPool:
+    """
+    Pool borné de connexions FTP, une file par couple (host, user).
+    Évite de refaire connexion + login à chaque publication.
+    """
+
+    def __init__(self, max_size: int = 2, max_idle: int = 60, timeout: int = 10):
+        """
+        Args:
+            max_size: Nombre maximum de connexions inactives gardées par serveur
+            max_idle: Durée (s) au-delà de laquelle une connexion inactive est recyclée
+            timeout: Timeout réseau des connexions (s)
+        """
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._queues: Dict[Tuple[str, str], queue.Queue] = {}
+        self._lock = threading.Lock()
+
+    def _get_queue(self, key: Tuple[str, str]) -> queue.Queue:
+        with self._lock:
+            if key not in self._queues:
+                self._queues[key] = queue.Queue(maxsize=self.max_size)
+            return self._queues[key]
+
+    def _connect(self, host: str, user: str, password: str):
+        ftp = _TunedFTP(host, user, password, timeout=self.timeout)
+        # Répertoire de connexion, pour repartir d'un état connu à chaque réutilisation
+        return ftp, ftp.pwd()
+
+    @staticmethod
+    def _close(ftp):
+        try:
+            ftp.quit()
+        except Exception:
+            ftp.close()
+
+    @contextmanager
+    def get(self, ftp_config: Dict[str, str]):
+        """
+        Fournit une connexion FTP positionnée dans son répertoire de connexion.
+        La connexion est rendue au pool en cas de succès, fermée en cas d'erreur.
+        """
+        host = ftp_config.get('host')
+        user = ftp_config.get('user')
+        password = ftp_config.get('password')
+        pool = self._get_queue((host, user))
+
+        conn = None
+        while conn is None:
+            try:
+                ftp, home, last_used = pool.get_nowait()
+            except queue.Empty:
+                ftp, home = self._connect(host, user, password)
+                conn = (ftp, home)
+                break
+
+            # Recycler les connexions trop anciennes ou coupées par le serveur
+            if time.monotonic() - last_used > self.max_idle:
+                self._close(ftp)
+                continue
+            try:
+                ftp.cwd(home)
+                conn = (ftp, home)
+            except ftplib.all_errors:
+                self._close(ftp)
+
+        ftp, home = conn
+        try:
+            yield ftp
+        except Exception:
+            self._close(ftp)
+            raise
+        else:
+            try:
+                pool.put_nowait((ftp, home, time.monotonic()))
+            except queue.Full:
+                self._close(ftp)
+
+    def close_all(self):
+        """Ferme toutes les connexions inactives du pool (arrêt du processus)."""
+        with self._lock:
+            pools = list(self._queues.values())
+        for pool in pools:
+            while True:
+                try:
+                    ftp, _home, _last_used = pool.get_nowait()
+                except queue.Empty:
+                    break
+                self._close(ftp)
+
+
+ftp_pool = FTPPool()
+atexit.register(ftp_pool.close_all)
+
+
+# Répertoires distants déjà vérifiés / créés, par serveur (host, user) : évite CWD (et MKD) à chaque publication
+_known_dirs: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+_known_dirs_lock = threading.Lock()
+
+
+def _enter_remote_path(ftp, remote_path: str):
+    """Se place dans le répertoire distant, en le créant s'il n'existe pas."""
+    try:
+        ftp.cwd(remote_path)
+    except ftplib.error_perm:
+        # Essayer de créer le répertoire s'il n'existe pas
+        ftp.mkd(remote_path)
+        ftp.cwd(remote_path)
+
+
+def _store_files(ftp, ftp_config: Dict[str, str], files: List[Tuple[str, bytes]]):
+    """
+    Envoie des fichiers dans le répertoire distant de la configuration.
+
+    Un répertoire déjà connu n'est pas revisité : les fichiers sont envoyés avec leur chemin
+    complet (le pool replace chaque connexion dans son répertoire de connexion). Sinon on s'y
+    place (en le créant si besoin) et il est mémorisé pour les publications suivantes.
+    """
+    remote_path = ftp_config.get('path', '/')
+    key = (ftp_config.get('host'), ftp_config.get('user'))
+
+    prefix = ''
+    if remote_path and remote_path != '/':
+        with _known_dirs_lock:
+            known = remote_path in _known_dirs[key]
+        if known:
+            prefix = remote_path.rstrip('/') + '/'
+        else:
+            _enter_remote_path(ftp, remote_path)
+            with _known_dirs_lock:
+                _known_dirs[key].add(remote_path)
+
+    for filename, data in files:
+        try:
+            ftp.storbinary(f'STOR {prefix}{filename}', io.BytesIO(data), blocksize=FTP_BLOCKSIZE)
+        except ftplib.error_perm:
+            if not prefix:
+                raise
+            # Répertoire supprimé côté serveur depuis sa mise en cache : le recréer et réessayer
+            _enter_remote_path(ftp, remote_path)
+            prefix = ''
+            ftp.storbinary(f'STOR {filename}', io.BytesIO(data), blocksize=FTP_BLOCKSIZE)
 
 
 def publish_via_ftp(html_content: str, filename: str, ftp_config: Dict[str, str]) -> bool:
@@ -30,34 +221,60 @@ def publish_via_ftp(html_content: str, filename: str, ftp_config: Dict[str, str]
     if not all([host, user, password]):
         raise ValueError("Configuration FTP incomplète (host, user, password sont requis).")
 
-    # Créer un fichier temporaire avec le contenu HTML
-    with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.html', encoding='utf-8') as tmp_file:
-        tmp_file.write(html_content)
-        local_filepath = tmp_file.name
-
     try:
-        # Connexion au serveur FTP
-        with ftplib.FTP(host, user, password, timeout=10) as ftp:
-            # Se déplacer vers le bon répertoire
-            if remote_path and remote_path != '/':
-                try:
-                    ftp.cwd(remote_path)
-                except ftplib.error_perm:
-                    # Essayer de créer le répertoire s'il n'existe pas
-                    ftp.mkd(remote_path)
-                    ftp.cwd(remote_path)
-
-            # Uploader le fichier
-            with open(local_filepath, 'rb') as file_to_upload:
-                ftp.storbinary(f'STOR {filename}', file_to_upload)
-        
-        print(f"✅ Fichier '{filename}' publié avec succès sur {host}:{remote_path}")
+        # Connexion au serveur FTP (réutilisée depuis le pool si possible)
+        with ftp_pool.get(ftp_config) as ftp:
+            # Uploader le fichier depuis la mémoire (pas de fichier temporaire), dans le bon répertoire
+            _store_files(ftp, ftp_config, [(filename, html_content.encode('utf-8'))])
+
+        _log.info("Fichier '%s' publié avec succès sur %s:%s", filename, host, remote_path)
         return True
 
     except Exception as e:
-        print(f"❌ Erreur de publication FTP: {e}")
+        _log.exception("Erreur de publication FTP: %s", e)
         return False
-    finally:
-        # Supprimer le fichier temporaire
-        if os.path.exists(local_filepath):
-            os.remove(local_filepath)
\ No newline at end of file
+
+
+def _publish_batch(items: List[Tuple[str, str]], ftp_config: Dict[str, str]) -> Dict[str, bool]:
+    """Publie une liste de fichiers sur une seule connexion FTP."""
+    try:
+        with ftp_pool.get(ftp_config) as ftp:
+            files = [(filename, html_content.encode('utf-8')) for filename, html_content in items]
+            _store_files(ftp, ftp_config, files)
+        _log.info("%d fichier(s) publié(s) avec succès sur %s:%s", len(items), ftp_config.get('host'), ftp_config.get('path', '/'))
+        return {filename: True for filename, _ in items}
+    except Exception as e:
+        _log.exception("Erreur de publication FTP: %s", e)
+        return {filename: False for filename, _ in items}
+
+
+def publish_many_via_ftp(items: List[Tuple[str, str]], ftp_config: Dict[str, str]) -> Dict[str, bool]:
+    """
+    Publie plusieurs fichiers HTML sur un même serveur FTP en réutilisant la connexion
+    (connexion, authentification et changement de répertoire faits une seule fois).
+
+    Args:
+        items (list): Liste de tuples (nom du fichier distant, contenu HTML).
+        ftp_config (dict): 'host', 'user', 'password', 'path' et, en option, 'concurrency'
+                           (nombre de connexions parallèles, 1 par défaut).
+
+    Returns:
+        dict: {nom du fichier: True si publié, False sinon}.
+    """
+    if not all([ftp_config.get('host'), ftp_config.get('user'), ftp_config.get('password')]):
+        raise ValueError("Configuration FTP incomplète (host, user, password sont requis).")
+
+    items = list(items)
+    if not items:
+        return {}
+    concurrency = max(1, min(int(ftp_config.get('concurrency') or 1), len(items)))
+    if concurrency == 1:
+        return _publish_batch(items, ftp_config)
+
+    # Une connexion par worker (ftplib n'est pas thread-safe) : fichiers répartis entre les workers
+    batches = [items[i::concurrency] for i in range(concurrency)]
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch_results in executor.map(lambda batch: _publish_batch(batch, ftp_config), batches):
+            results.update(batch_results)
+    return results
@@ -3,327 +3,222 @@
 Moteur de génération de templates HTML pour les fiches de voyage
 """
 
-from typing import Dict, Any, List, Optional
+import os
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+from types import MethodType
+from typing import Dict, Any, Iterable, Iterator, List, Optional, TypedDict
 from datetime import datetime, time
 
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from markupsafe import Markup
 
-class TemplateEngine:
-    """Générateur de templates HTML pour les fiches de voyage"""
-    
-    # Templates disponibles
-    TEMPLATES = {
-        'classic': 'template_classic',
-        'modern': 'template_modern', 
-        'luxury': 'template_luxury'
-    }
-    
-    def __init__(self, agency_config: Dict[str, Any]) -> None:
-        """
-        Initialise le moteur de templates
-        
-        Args:
-            agency_config: Configuration de l'agence (nom, couleurs, logo, etc.)
-        """
-        self.agency_config = agency_config
-        self.primary_color = agency_config.get('primary_color', '#3B82F6')
-        self.agency_name = agency_config.get('name', 'Agence de Voyages')
-        self.logo_url = agency_config.get('logo_url', '')
-        self.contact_email = agency_config.get('contact_email', '')
-        self.contact_phone = agency_config.get('contact_phone', '')
-    
-    def render_trip_template(self, trip_data: Dict[str, Any], 
-                           template_type: str = 'standard',
-                           style: Optional[str] = 'classic') -> str:
-        """
-        Génère le HTML complet de la fiche de voyage
-        
-        Args:
-            trip_data: Toutes les données du voyage (form_data + api_data)
-            template_type: Type de template ('standard' ou 'day_trip')
-            style: Style du template ('classic', 'modern', 'luxury')
-            
-        Returns:
-            HTML complet de la fiche
-        """
-        
-        # Sélectionner la méthode de rendu selon le style
-        render_method = getattr(self, f'_{self.TEMPLATES.get(style, "template_classic")}', None)
-        
-        if not render_method:
-            render_method = self._template_classic
-        
-        # Générer le HTML selon le type de voyage
-        if template_type == 'day_trip':
-            return self._render_day_trip(trip_data, render_method)
-        else:
-            return self._render_standard_trip(trip_data, render_method)
-    
-    def _render_standard_trip(self, trip_data: Dict[str, Any], render_method) -> str:
-        """
-        Génère une fiche pour un séjour standard
-        
-        Args:
-            trip_data: Données du voyage
-            render_method: Méthode de rendu selon le style
-            
-        Returns:
-            HTML de la fiche
-        """
-        form_data = trip_data.get('form_data', {})
-        api_data = trip_data.get('api_data', {})
-        
-        # Préparer les données pour le template
-        context = {
-            'agency': self.agency_config,
-            'trip': {
-                'destination': form_data.get('destination', ''),
-                'hotel_name': form_data.get('hotel_name', ''),
-                'dates': {
-                    'start': form_data.get('date_start', ''),
-                    'end': form_data.get('date_end', ''),
-                    'duration': form_data.get('estimated_duration', 0)
-                },
-                'transport': form_data.get('transport_type', ''),
-                'meal_plan': form_data.get('meal_plan', ''),
-                'stars': form_data.get('stars', 3),
-                'price': form_data.get('pack_price', 0),
-                'num_people': form_data.get('num_people', 2),
-                'activities': form_data.get('activities', [])
-            },
-            'enriched': {
-                'photos': api_data.get('photos', []),
-                'videos': api_data.get('videos', []),
-                'attractions': api_data.get('attractions', {}).get('nearby', []),
-                'reviews': api_data.get('reviews_summary', {}),
-                'destination_info': api_data.get('destination_info', {}),
-                'hotel_info': api_data.get('hotel_info', {})
-            },
-            'pricing': {
-                'margin': trip_data.get('margin', 0),
-                'savings': trip_data.get('savings', 0)
-            }
-        }
-        
-        return render_method(context, 'standard')
-    
-    def _render_day_trip(self, trip_data: Dict[str, Any], render_method) -> str:
-        """
-        Génère une fiche pour une excursion d'un jour
-        
-        Args:
-            trip_data: Données du voyage
-            render_method: Méthode de rendu selon le style
-            
-        Returns:
-            HTML de la fiche
-        """
-        form_data = trip_data.get('form_data', {})
-        api_data = trip_data.get('api_data', {})
-        
-        # Préparer les données pour le template
-        context = {
-            'agency': self.agency_config,
-            'trip': {
-                'destination': form_data.get('destination', ''),
-                'departure_time': form_data.get('departure_time', '08:00'),
-                'return_time': form_data.get('return_time', '20:00'),
-                'departure_address': form_data.get('bus_departure_address', ''),
-                'transport': 'autocar',  # Toujours autocar pour excursion
-                'price': form_data.get('pack_price', 0),
-                'activities': form_data.get('activities', []),
-                'program': form_data.get('program', [])
-            },
-            'enriched': {
-                'photos': api_data.get('photos', []),
-                'videos': api_data.get('videos', []),
-                'attractions': api_data.get('attractions', {}).get('nearby', []),
-                'destination_info': api_data.get('destination_info', {})
-            },
-            'pricing': {
-                'margin': trip_data.get('margin', 0),
-                'savings': trip_data.get('savings', 0)
-            }
-        }
-        
-        return render_method(context, 'day_trip')
-    
-    def _template_classic(self, context: Dict[str, Any], trip_type: str) -> str:
-        """
-        Template Classic - Style traditionnel et épuré
-        
-        Args:
-            context: Contexte avec toutes les données
-            trip_type: Type de voyage
-            
-        Returns:
-            HTML complet
-        """
-        
-        # CSS du template classic
-        css = f"""
-            * {{
+
+# ==============================================================================
+# LIBELLÉS
+# ==============================================================================
+
+_TRANSPORTS = {
+    'avion': '✈️ Avion',
+    'train': '🚂 Train',
+    'autocar': '🚌 Autocar',
+    'voiture': '🚗 Voiture'
+}
+
+_MEAL_PLANS = {
+    'logement_seul': 'Logement seul',
+    'petit_dejeuner': 'Petit-déjeuner',
+    'demi_pension': 'Demi-pension',
+    'pension_complete': 'Pension complète',
+    'all_in': 'All Inclusive'
+}
+
+
+# ==============================================================================
+# DONNÉES D'ENTRÉE
+# ==============================================================================
+
+class TripData(TypedDict, total=False):
+    """
+    Données d'un voyage telles que stockées (Trip.full_data_json) ou reçues de l'aperçu.
+    Simple annotation : reste un dict à l'exécution (données JSON passées telles quelles).
+    """
+    form_data: Dict[str, Any]
+    api_data: Dict[str, Any]
+    margin: int
+    savings: int
+
+
+# ==============================================================================
+# CSS DES TEMPLATES
+# ==============================================================================
+
+# CSS du template classic : seules les couleurs de l'agence sont substituées à chaque rendu
+_CLASSIC_CSS = Template("""
+            * {
                 margin: 0;
                 padding: 0;
                 box-sizing: border-box;
-            }}
+            }
             
-            body {{
+            body {
                 font-family: 'Georgia', serif;
                 line-height: 1.6;
                 color: #333;
                 background: #fff;
-            }}
+            }
             
-            .header {{
-                background: linear-gradient(135deg, {self.primary_color}, {self._darken_color(self.primary_color)});
+            .header {
+                background: linear-gradient(135deg, $primary_color, $darker_color);
                 color: white;
                 padding: 3rem 2rem;
                 text-align: center;
-            }}
+            }
             
-            .header h1 {{
+            .header h1 {
                 font-size: 2.5rem;
                 margin-bottom: 0.5rem;
-            }}
+            }
             
-            .header .subtitle {{
+            .header .subtitle {
                 font-size: 1.2rem;
                 opacity: 0.9;
-            }}
+            }
             
-            .container {{
+            .container {
                 max-width: 1200px;
                 margin: 0 auto;
                 padding: 2rem;
-            }}
+            }
             
-            .section {{
+            .section {
                 margin-bottom: 3rem;
                 padding: 2rem;
                 background: #f8f9fa;
                 border-radius: 10px;
-            }}
+            }
             
-            .section h2 {{
-                color: {self.primary_color};
+            .section h2 {
+                color: $primary_color;
                 margin-bottom: 1.5rem;
                 font-size: 1.8rem;
-                border-bottom: 2px solid {self.primary_color};
+                border-bottom: 2px solid $primary_color;
                 padding-bottom: 0.5rem;
-            }}
+            }
             
-            .photos-grid {{
+            .photos-grid {
                 display: grid;
                 grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
                 gap: 1.5rem;
                 margin-top: 2rem;
-            }}
+            }
             
-            .photo-card img {{
+            .photo-card img {
                 width: 100%;
                 height: 250px;
                 object-fit: cover;
                 border-radius: 10px;
-            }}
+            }
             
-            .info-grid {{
+            .info-grid {
                 display: grid;
                 grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
                 gap: 2rem;
                 margin-top: 2rem;
-            }}
+            }
             
-            .info-item {{
+            .info-item {
                 background: white;
                 padding: 1.5rem;
                 border-radius: 8px;
                 box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }}
+            }
             
-            .info-item .label {{
+            .info-item .label {
                 font-weight: bold;
                 color: #666;
                 margin-bottom: 0.5rem;
-            }}
+            }
             
-            .info-item .value {{
+            .info-item .value {
                 font-size: 1.1rem;
                 color: #333;
-            }}
+            }
             
-            .price-box {{
-                background: {self.primary_color};
+            .price-box {
+                background: $primary_color;
                 color: white;
                 padding: 2rem;
                 border-radius: 10px;
                 text-align: center;
                 margin: 2rem 0;
-            }}
+            }
             
-            .price-box .amount {{
+            .price-box .amount {
                 font-size: 3rem;
                 font-weight: bold;
-            }}
+            }
             
-            .price-box .per-person {{
+            .price-box .per-person {
                 font-size: 1rem;
                 opacity: 0.9;
-            }}
+            }
             
-            .attractions {{
+            .attractions {
                 display: grid;
                 grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
                 gap: 1.5rem;
-            }}
+            }
             
-            .attraction-card {{
+            .attraction-card {
                 background: white;
                 border-radius: 8px;
                 overflow: hidden;
                 box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            }}
+            }
             
-            .attraction-card img {{
+            .attraction-card img {
                 width: 100%;
                 height: 150px;
                 object-fit: cover;
-            }}
+            }
             
-            .attraction-card .content {{
+            .attraction-card .content {
                 padding: 1rem;
-            }}
+            }
             
-            .attraction-card .name {{
+            .attraction-card .name {
                 font-weight: bold;
                 margin-bottom: 0.5rem;
-            }}
+            }
             
-            .attraction-card .rating {{
+            .attraction-card .rating {
                 color: #f59e0b;
-            }}
+            }
             
-            .program-timeline {{
+            .program-timeline {
                 position: relative;
                 padding-left: 3rem;
-            }}
+            }
             
-            .program-item {{
+            .program-item {
                 position: relative;
                 padding-bottom: 2rem;
-            }}
+            }
             
-            .program-item::before {{
+            .program-item::before {
                 content: '';
                 position: absolute;
                 left: -2rem;
                 top: 0;
                 width: 12px;
                 height: 12px;
-                background: {self.primary_color};
+                background: $primary_color;
                 border-radius: 50%;
-            }}
+            }
             
-            .program-item::after {{
+            .program-item::after {
                 content: '';
                 position: absolute;
                 left: -1.94rem;
@@ -331,259 +226,242 @@ class TemplateEngine:
                 width: 2px;
                 height: calc(100% - 12px);
                 background: #ddd;
-            }}
+            }
             
-            .program-item:last-child::after {{
+            .program-item:last-child::after {
                 display: none;
-            }}
+            }
             
-            .program-time {{
+            .program-time {
                 font-weight: bold;
-                color: {self.primary_color};
+                color: $primary_color;
                 margin-bottom: 0.5rem;
-            }}
+            }
             
-            .footer {{
+            .footer {
                 background: #333;
                 color: white;
                 padding: 2rem;
                 text-align: center;
                 margin-top: 3rem;
-            }}
+            }
             
-            .footer .contact {{
+            .footer .contact {
                 margin-top: 1rem;
-            }}
+            }
             
-            .footer .contact a {{
+            .footer .contact a {
                 color: white;
                 text-decoration: none;
                 margin: 0 1rem;
-            }}
+            }
             
-            @media print {{
-                .section {{
+            @media print {
+                .section {
                     break-inside: avoid;
-                }}
-            }}
+                }
+            }
+        """)
+
+
+@lru_cache(maxsize=64)
+def _classic_css(primary_color: str, darker_color: str) -> str:
+    """
+    CSS du template classic. Ne dépend que des couleurs de l'agence :
+    construit une seule fois par couleur, puis réutilisé à chaque rendu.
+    """
+    return _CLASSIC_CSS.substitute(primary_color=primary_color, darker_color=darker_color)
+
+
+class TemplateEngine:
+    """Générateur de templates HTML pour les fiches de voyage"""
+    
+    # Templates disponibles
+    TEMPLATES = {
+        'classic': 'template_classic',
+        'modern': 'template_modern', 
+        'luxury': 'template_luxury'
+    }
+    
+    def __init__(self, agency_config: Dict[str, Any]) -> None:
         """
+        Initialise le moteur de templates
         
-        # Générer le contenu selon le type
-        if trip_type == 'day_trip':
-            content = self._generate_day_trip_content(context)
-        else:
-            content = self._generate_standard_content(context)
-        
-        # HTML complet
-        html = f"""
-<!DOCTYPE html>
-<html lang="fr">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{context['trip']['destination']} - {self.agency_name}</title>
-    <style>{css}</style>
-</head>
-<body>
-    {content}
-</body>
-</html>
-"""
+        Args:
+            agency_config: Configuration de l'agence (nom, couleurs, logo, etc.)
+        """
+        self.agency_config = agency_config
+        self.primary_color = agency_config.get('primary_color', '#3B82F6')
+        self.agency_name = agency_config.get('name', 'Agence de Voyages')
+        self.logo_url = agency_config.get('logo_url', '')
+        self.contact_email = agency_config.get('contact_email', '')
+        self.contact_phone = agency_config.get('contact_phone', '')
         
-        return html
+        # Éléments ne dépendant que de l'agence : calculés une seule fois pour toutes les fiches
+        self.darker_color = self._darken_color(self.primary_color)
+        self._css = Markup(_classic_css(self.primary_color, self.darker_color))
+        self._footer_html = Markup(_TRIP_SHEETS_ENV.get_template('_footer.html').render(
+            agency_name=self.agency_name,
+            contact_email=self.contact_email,
+            contact_phone=self.contact_phone
+        ))
     
-    def _generate_standard_content(self, context: Dict[str, Any]) -> str:
+    def render_trip_template(self, trip_data: TripData, 
+                           template_type: str = 'standard',
+                           style: Optional[str] = 'classic') -> str:
         """
-        Génère le contenu HTML pour un séjour standard
+        Génère le HTML complet de la fiche de voyage
         
         Args:
-            context: Contexte avec les données
+            trip_data: Toutes les données du voyage (form_data + api_data)
+            template_type: Type de template ('standard' ou 'day_trip')
+            style: Style du template ('classic', 'modern', 'luxury')
             
         Returns:
-            HTML du contenu
+            HTML complet de la fiche
         """
-        trip = context['trip']
-        enriched = context['enriched']
+        return ''.join(self.stream_trip_template(trip_data, template_type, style))
+    
+    def stream_trip_template(self, trip_data: TripData, 
+                             template_type: str = 'standard',
+                             style: Optional[str] = 'classic') -> Iterator[str]:
+        """
+        Génère le HTML de la fiche de voyage par fragments, au fil du rendu
         
-        # Photos
-        photos_html = ""
-        if enriched['photos']:
-            photos_html = f"""
-            <section class="section">
-                <h2>📸 Photos</h2>
-                <div class="photos-grid">
-                    {' '.join([f'<div class="photo-card"><img src="{p["url"]}" alt="Photo"></div>' for p in enriched['photos'][:6]])}
-                </div>
-            </section>
-            """
+        Args:
+            trip_data: Toutes les données du voyage (form_data + api_data)
+            template_type: Type de template ('standard' ou 'day_trip')
+            style: Style du template ('classic', 'modern', 'luxury')
+            
+        Returns:
+            Itérateur sur les fragments HTML de la fiche
+        """
         
-        # Attractions
-        # MODIFIÉ : Correction de la source des attractions
-        attractions_html = ""
-        if enriched.get('attractions'):
-            attractions_items = ""
-            for att in enriched['attractions']:
-                img_html = f'<img src="{att["photo_url"]}" alt="{att["name"]}">' if att.get('photo_url') else '<div style="height:150px;background:#ddd;"></div>'
-                attractions_items += f"""
-                <div class="attraction-card">
-                    {img_html}
-                    <div class="content">
-                        <div class="name">{att['name']}</div>
-                        <div class="rating">{'⭐ ' + str(att.get('rating', '')) if att.get('rating') else ''}</div>
-                    </div>
-                </div>
-                """
-            
-            attractions_html = f"""
-            <section class="section">
-                <h2>🎯 Attractions à proximité</h2>
-                <div class="attractions">
-                    {attractions_items}
-                </div>
-            </section>
-            """
+        # Sélectionner la méthode de rendu selon le style (table construite à l'import)
+        render_method = MethodType(_STYLE_RENDERERS.get(style, TemplateEngine._template_classic), self)
         
-        # Contenu complet
-        content = f"""
-        <header class="header">
-            <h1>{trip['destination']}</h1>
-            <div class="subtitle">{trip.get('hotel_name', 'Séjour découverte')}</div>
-        </header>
+        # Générer le HTML selon le type de voyage
+        if template_type == 'day_trip':
+            return self._render_day_trip(trip_data, render_method)
+        else:
+            return self._render_standard_trip(trip_data, render_method)
+    
+    def _render_standard_trip(self, trip_data: TripData, render_method) -> Iterator[str]:
+        """
+        Génère une fiche pour un séjour standard
         
-        <div class="container">
-            <!-- Informations principales -->
-            <section class="section">
-                <h2>📋 Informations du séjour</h2>
-                <div class="info-grid">
-                    <div class="info-item">
-                        <div class="label">📅 Dates</div>
-                        <div class="value">{trip['dates']['start']} au {trip['dates']['end']}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">✈️ Transport</div>
-                        <div class="value">{self._format_transport(trip['transport'])}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">🏨 Hébergement</div>
-                        <div class="value">{'⭐' * trip.get('stars', 3)} {trip.get('hotel_name', 'Hôtel')}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">🍽️ Formule</div>
-                        <div class="value">{self._format_meal_plan(trip.get('meal_plan', ''))}</div>
-                    </div>
-                </div>
-            </section>
-            
-            <!-- Prix -->
-            <div class="price-box">
-                <div class="amount">{trip['price']} €</div>
-                <div class="per-person">par personne</div>
-            </div>
-            
-            {photos_html}
-            
-            {attractions_html}
-            
-            <!-- Contact -->
-            <footer class="footer">
-                <h3>{self.agency_name}</h3>
-                <div class="contact">
-                    <a href="mailto:{self.contact_email}">✉️ {self.contact_email}</a>
-                    <a href="tel:{self.contact_phone}">📞 {self.contact_phone}</a>
-                </div>
-            </footer>
-        </div>
+        Args:
+            trip_data: Données du voyage
+            render_method: Méthode de rendu selon le style
+            
+        Returns:
+            Fragments HTML de la fiche
         """
+        # Accès aux dictionnaires liés une seule fois en variables locales
+        form = trip_data.get('form_data', {}).get
+        api = trip_data.get('api_data', {}).get
+        
+        # Préparer les données pour le template
+        context = {
+            'agency': self.agency_config,
+            'trip': {
+                'destination': form('destination', ''),
+                'hotel_name': form('hotel_name', ''),
+                'dates': {
+                    'start': form('date_start', ''),
+                    'end': form('date_end', ''),
+                    'duration': form('estimated_duration', 0)
+                },
+                'transport': form('transport_type', ''),
+                'meal_plan': form('meal_plan', ''),
+                'stars': form('stars', 3),
+                'price': form('pack_price', 0),
+                'num_people': form('num_people', 2),
+                'activities': form('activities', [])
+            },
+            'enriched': {
+                'photos': api('photos', []),
+                'videos': api('videos', []),
+                'attractions': api('attractions', {}).get('nearby', []),
+                'reviews': api('reviews_summary', {}),
+                'destination_info': api('destination_info', {}),
+                'hotel_info': api('hotel_info', {})
+            },
+            'pricing': {
+                'margin': trip_data.get('margin', 0),
+                'savings': trip_data.get('savings', 0)
+            }
+        }
         
-        return content
+        return render_method(context, 'standard')
     
-    def _generate_day_trip_content(self, context: Dict[str, Any]) -> str:
+    def _render_day_trip(self, trip_data: TripData, render_method) -> Iterator[str]:
         """
-        Génère le contenu HTML pour une excursion d'un jour
+        Génère une fiche pour une excursion d'un jour
         
         Args:
-            context: Contexte avec les données
+            trip_data: Données du voyage
+            render_method: Méthode de rendu selon le style
             
         Returns:
-            HTML du contenu
+            Fragments HTML de la fiche
         """
-        trip = context['trip']
-        enriched = context['enriched']
+        # Accès aux dictionnaires liés une seule fois en variables locales
+        form = trip_data.get('form_data', {}).get
+        api = trip_data.get('api_data', {}).get
         
-        # Programme de la journée
-        program_html = ""
-        if trip.get('program'):
-            program_items = ""
-            for item in trip['program']:
-                program_items += f"""
-                <div class="program-item">
-                    <div class="program-time">{item.get('time', '')}</div>
-                    <div class="program-activity">{item.get('activity', '')}</div>
-                </div>
-                """
-            
-            program_html = f"""
-            <section class="section">
-                <h2>📅 Programme de la journée</h2>
-                <div class="program-timeline">
-                    {program_items}
-                </div>
-            </section>
-            """
+        # Préparer les données pour le template
+        context = {
+            'agency': self.agency_config,
+            'trip': {
+                'destination': form('destination', ''),
+                'departure_time': form('departure_time', '08:00'),
+                'return_time': form('return_time', '20:00'),
+                'departure_address': form('bus_departure_address', ''),
+                'transport': 'autocar',  # Toujours autocar pour excursion
+                'price': form('pack_price', 0),
+                'activities': form('activities', []),
+                'program': form('program', [])
+            },
+            'enriched': {
+                'photos': api('photos', []),
+                'videos': api('videos', []),
+                'attractions': api('attractions', {}).get('nearby', []),
+                'destination_info': api('destination_info', {})
+            },
+            'pricing': {
+                'margin': trip_data.get('margin', 0),
+                'savings': trip_data.get('savings', 0)
+            }
+        }
         
-        # Contenu complet
-        content = f"""
-        <header class="header">
-            <h1>Excursion à {trip['destination']}</h1>
-            <div class="subtitle">Voyage d'un jour en autocar</div>
-        </header>
+        return render_method(context, 'day_trip')
+    
+    def _template_classic(self, context: Dict[str, Any], trip_type: str) -> Iterator[str]:
+        """
+        Template Classic - Style traditionnel et épuré
         
-        <div class="container">
-            <!-- Informations principales -->
-            <section class="section">
-                <h2>📋 Informations pratiques</h2>
-                <div class="info-grid">
-                    <div class="info-item">
-                        <div class="label">🚌 Départ</div>
-                        <div class="value">{trip['departure_time']} - {trip.get('departure_address', 'À définir')}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">🏁 Retour</div>
-                        <div class="value">{trip['return_time']}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">📍 Destination</div>
-                        <div class="value">{trip['destination']}</div>
-                    </div>
-                    <div class="info-item">
-                        <div class="label">🎯 Activités</div>
-                        <div class="value">{', '.join(trip.get('activities', []))}</div>
-                    </div>
-                </div>
-            </section>
-            
-            <!-- Prix -->
-            <div class="price-box">
-                <div class="amount">{trip['price']} €</div>
-                <div class="per-person">tout compris</div>
-            </div>
-            
-            {program_html}
-            
-            <!-- Contact -->
-            <footer class="footer">
-                <h3>{self.agency_name}</h3>
-                <div class="contact">
-                    <a href="mailto:{self.contact_email}">✉️ {self.contact_email}</a>
-                    <a href="tel:{self.contact_phone}">📞 {self.contact_phone}</a>
-                </div>
-            </footer>
-        </div>
+        Args:
+            context: Contexte avec toutes les données
+            trip_type: Type de voyage
+            
+        Returns:
+            Fragments du HTML complet
         """
         
-        return content
+        # Template compilé à l'import, puis réutilisé
+        template = _TRIP_SHEET_TEMPLATES['day_trip' if trip_type == 'day_trip' else 'standard']
+        if _TRIP_SHEETS_ENV.auto_reload:
+            # Mode debug : repasser par l'environnement pour prendre en compte les fichiers modifiés
+            template = _TRIP_SHEETS_ENV.get_template(template.name)
+        return template.generate(
+            context,
+            css=self._css,
+            footer=self._footer_html,
+            agency_name=self.agency_name
+        )
     
-    def _template_modern(self, context: Dict[str, Any], trip_type: str) -> str:
+    def _template_modern(self, context: Dict[str, Any], trip_type: str) -> Iterator[str]:
         """
         Template Modern - Style contemporain avec animations
         À implémenter : design plus moderne avec gradients et animations CSS
@@ -591,7 +469,7 @@ class TemplateEngine:
         # Pour l'instant, utilise le template classic
         return self._template_classic(context, trip_type)
     
-    def _template_luxury(self, context: Dict[str, Any], trip_type: str) -> str:
+    def _template_luxury(self, context: Dict[str, Any], trip_type: str) -> Iterator[str]:
         """
         Template Luxury - Style premium et élégant
         À implémenter : design luxueux avec effets visuels sophistiqués
@@ -603,28 +481,19 @@ class TemplateEngine:
     # UTILITAIRES
     # ==============================================================================
     
-    def _format_transport(self, transport: str) -> str:
+    @staticmethod
+    def _format_transport(transport: str) -> str:
         """Formate le type de transport"""
-        transports = {
-            'avion': '✈️ Avion',
-            'train': '🚂 Train',
-            'autocar': '🚌 Autocar',
-            'voiture': '🚗 Voiture'
-        }
-        return transports.get(transport, transport.capitalize())
+        return _TRANSPORTS.get(transport, transport.capitalize())
     
-    def _format_meal_plan(self, meal_plan: str) -> str:
+    @staticmethod
+    def _format_meal_plan(meal_plan: str) -> str:
         """Formate la formule repas"""
-        plans = {
-            'logement_seul': 'Logement seul',
-            'petit_dejeuner': 'Petit-déjeuner',
-            'demi_pension': 'Demi-pension',
-            'pension_complete': 'Pension complète',
-            'all_in': 'All Inclusive'
-        }
-        return plans.get(meal_plan, meal_plan.replace('_', ' ').capitalize())
+        return _MEAL_PLANS.get(meal_plan, meal_plan.replace('_', ' ').capitalize())
     
-    def _darken_color(self, hex_color: str, factor: float = 0.8) -> str:
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _darken_color(hex_color: str, factor: float = 0.8) -> str:
         """
         Assombrit une couleur hexadécimale
         
@@ -636,31 +505,65 @@ class TemplateEngine:
             Couleur assombrie
         """
         try:
-            # Enlever le #
+            # Lire les trois composantes en une seule conversion (entier 24 bits)
             hex_color = hex_color.lstrip('#')
+            if len(hex_color) != 6:
+                raise ValueError(hex_color)
+            rgb = int(hex_color, 16)
             
-            # Convertir en RGB
-            r = int(hex_color[0:2], 16)
-            g = int(hex_color[2:4], 16)
-            b = int(hex_color[4:6], 16)
+            # Assombrir chaque composante et recomposer
+            r = int((rgb >> 16 & 0xFF) * factor)
+            g = int((rgb >> 8 & 0xFF) * factor)
+            b = int((rgb & 0xFF) * factor)
+            return f'#{r << 16 | g << 8 | b:06x}'
             
-            # Assombrir
-            r = int(r * factor)
-            g = int(g * factor)
-            b = int(b * factor)
-            
-            # Reconvertir en hex
-            return f'#{r:02x}{g:02x}{b:02x}'
-            
-        except:
+        except (AttributeError, ValueError):
             return '#2563eb'  # Couleur par défaut si erreur
 
 
+# ==============================================================================
+# TEMPLATES JINJA
+# ==============================================================================
+
+# Bytecode des templates gardé sur disque, comme pour les pages de l'application : après un redémarrage,
+# le premier rendu de chaque worker ne reparse pas les templates (dossier temporaire du système par défaut)
+_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+if _BYTECODE_CACHE_DIR:
+    os.makedirs(_BYTECODE_CACHE_DIR, exist_ok=True)
+
+# Environnement partagé : chaque template est compilé au premier rendu puis gardé en mémoire.
+# En production les fichiers ne changent qu'au déploiement : pas de vérification de date à chaque rendu
+# (rechargement automatique uniquement en mode debug, comme les pages de l'application).
+_TRIP_SHEETS_ENV = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'trip_sheets')),
+    autoescape=True,
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=os.environ.get('FLASK_DEBUG', '0') == '1',
+    cache_size=128,
+    bytecode_cache=FileSystemBytecodeCache(_BYTECODE_CACHE_DIR)
+)
+_TRIP_SHEETS_ENV.filters['transport_label'] = TemplateEngine._format_transport
+_TRIP_SHEETS_ENV.filters['meal_plan_label'] = TemplateEngine._format_meal_plan
+
+# Templates compilés une fois pour toutes, par type de fiche
+_TRIP_SHEET_TEMPLATES = {
+    trip_type: _TRIP_SHEETS_ENV.get_template(f'{trip_type}.html')
+    for trip_type in ('standard', 'day_trip')
+}
+
+# Méthode de rendu par style, résolue une fois plutôt qu'à chaque fiche
+_STYLE_RENDERERS = {
+    style: getattr(TemplateEngine, f'_{method_name}')
+    for style, method_name in TemplateEngine.TEMPLATES.items()
+}
+
+
 # ==============================================================================
 # FONCTIONS UTILITAIRES
 # ==============================================================================
 
-def render_trip_template(data: Dict[str, Any], 
+def render_trip_template(data: TripData, 
                         template_type: str,
                         agency_style: str,
                         agency_config: Dict[str, Any]) -> str:
@@ -677,7 +580,60 @@ def render_trip_template(data: Dict[str, Any],
         HTML complet de la fiche
     """
     engine = TemplateEngine(agency_config)
-    return engine.render_trip_template(data, template_type, agency_style)
+    return _minify_html(engine.render_trip_template(data, template_type, agency_style))
+
+
+def render_trip_template_stream(data: TripData, 
+                                template_type: str,
+                                agency_style: str,
+                                agency_config: Dict[str, Any]) -> Iterator[str]:
+    """
+    Comme render_trip_template, mais produit la fiche par blocs au fil du rendu
+    (réponse HTTP en streaming, écriture dans un fichier) sans construire toute la chaîne.
+    
+    Args:
+        data: Données complètes du voyage
+        template_type: 'standard' ou 'day_trip'
+        agency_style: 'classic', 'modern' ou 'luxury'
+        agency_config: Configuration de l'agence
+        
+    Returns:
+        Itérateur sur les blocs HTML (leur concaténation est identique à render_trip_template)
+    """
+    engine = TemplateEngine(agency_config)
+    return _minify_stream(engine.stream_trip_template(data, template_type, agency_style))
+
+
+def _minify_html(html: str) -> str:
+    """
+    Allège le HTML généré : supprime l'indentation et les lignes vides des templates.
+    Les fiches ne contiennent ni <pre> ni <textarea>, où les espaces seraient significatifs ;
+    le rendu est identique, pour près de moitié moins d'octets à publier / mettre en cache.
+    """
+    return '\n'.join(line for line in map(str.strip, html.splitlines()) if line)
+
+
+def _minify_stream(chunks: Iterable[str], block_size: int = 64 * 1024) -> Iterator[str]:
+    """
+    Version incrémentale de _minify_html : les fragments sont regroupés en blocs
+    d'environ block_size caractères, coupés en fin de ligne puis allégés.
+    """
+    pending, size, separator = [], 0, ''
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size < block_size:
+            continue
+        text = ''.join(pending)
+        cut = text.rfind('\n') + 1
+        pending, size = [text[cut:]], len(text) - cut
+        block = _minify_html(text[:cut])
+        if block:
+            yield separator + block
+            separator = '\n'
+    block = _minify_html(''.join(pending))
+    if block:
+        yield separator + block
 
 
 # ==============================================================================
@@ -752,8 +708,7 @@ def _run_tests():
     
     # Sauvegarder le HTML pour test
     output_file = 'test_fiche_voyage.html'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+    Path(output_file).write_text(html, encoding='utf-8')
     
     print(f"✅ Fiche générée ! Sauvegardée dans {output_file}")
     print(f"   - Taille: {len(html)} caractères")
@@ -794,8 +749,7 @@ def _run_tests():
     )
     
     output_file_day = 'test_excursion_bruges.html'
-    with open(output_file_day, 'w', encoding='utf-8') as f:
-        f.write(html_day)
+    Path(output_file_day).write_text(html_day, encoding='utf-8')
     
     print(f"✅ Fiche excursion générée ! Sauvegardée dans {output_file_day}")
     
@@ -1,7 +1,13 @@
 # schemas.py - Modèles de validation Pydantic
 
-from pydantic import BaseModel, EmailStr, HttpUrl, constr, conint, Field, ValidationError
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, EmailStr, HttpUrl, StringConstraints, Field, ValidationError
+from typing import Annotated, Optional, Dict, Any
+
+# Types contraints (Pydantic v2 : contraintes déclarées via Annotated)
+NonEmptyStr = Annotated[str, StringConstraints(min_length=1)]
+SubdomainStr = Annotated[str, StringConstraints(min_length=3, pattern=r'^[a-z0-9-]+$')] # Alphanum + hyphen
+HexColorStr = Annotated[str, StringConstraints(pattern=r'^#[0-9a-fA-F]{6}$')]
+PositiveInt = Annotated[int, Field(ge=0)]
 
 # ==============================================================================
 # SCHÉMAS POUR LES AGENCES
@@ -9,18 +15,18 @@ from typing import Optional, Dict, Any
 
 class AgencyBaseSchema(BaseModel):
     """Champs communs pour la création et la mise à jour d'une agence."""
-    name: constr(min_length=1)
-    subdomain: constr(min_length=3, regex=r'^[a-z0-9-]+$') # Alphanum + hyphen
+    name: NonEmptyStr
+    subdomain: SubdomainStr
     contact_email: EmailStr
     logo_url: Optional[HttpUrl] = None
-    primary_color: Optional[constr(regex=r'^#[0-9a-fA-F]{6}$')] = '#3B82F6'
+    primary_color: Optional[HexColorStr] = '#3B82F6'
     template_name: Optional[str] = 'classic'
     contact_phone: Optional[str] = None
     contact_address: Optional[str] = None
     manual_payment_email_template: Optional[str] = None
     website_url: Optional[HttpUrl] = None
     subscription_tier: Optional[str] = 'basic'
-    monthly_generation_limit: conint(ge=0) = 100
+    monthly_generation_limit: PositiveInt = 100
     is_active: bool = True
 
     # Champs pour les configurations chiffrées (acceptent n'importe quelle valeur valide)
@@ -31,8 +37,8 @@ class AgencyBaseSchema(BaseModel):
 
 class AgencyCreateSchema(AgencyBaseSchema):
     """Schéma pour la création d'une agence. Tous les champs de base sont requis."""
-    name: constr(min_length=1)
-    subdomain: constr(min_length=3, regex=r'^[a-z0-9-]+$')
+    name: NonEmptyStr
+    subdomain: SubdomainStr
     contact_email: EmailStr
 
 class AgencyUpdateSchema(AgencyBaseSchema):
@@ -40,11 +46,10 @@ class AgencyUpdateSchema(AgencyBaseSchema):
     Schéma pour la mise à jour d'une agence.
     Tous les champs sont optionnels.
     """
-    name: Optional[constr(min_length=1)] = None
-    subdomain: Optional[constr(min_length=3, regex=r'^[a-z0-9-]+$')] = None
-    contact_email: Optional[EmailStr] = None
-    monthly_generation_limit: Optional[conint(ge=0)] = None
-    is_active: Optional[bool] = None
+    model_config = ConfigDict(extra='ignore') # Ignore les champs non définis dans le schéma
 
-    class Config:
-        extra = 'ignore' # Ignore les champs non définis dans le schéma
\ No newline at end of file
+    name: Optional[NonEmptyStr] = None
+    subdomain: Optional[SubdomainStr] = None
+    contact_email: Optional[EmailStr] = None
+    monthly_generation_limit: Optional[PositiveInt] = None
+    is_active: Optional[bool] = None
\ No newline at end of file
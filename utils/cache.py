@@ -0,0 +1,135 @@
+# utils/cache.py - Cache applicatif (Redis si disponible, sinon mémoire locale)
+"""
+Ce module fournit un petit cache clé/valeur avec expiration.
+Si REDIS_URL est configuré, les valeurs sont partagées entre workers via Redis ;
+sinon, un dictionnaire LRU en mémoire (propre au processus, borné en nombre
+d'entrées) est utilisé.
+Les valeurs stockées sont des chaînes de caractères.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # Redis reste optionnel en développement
+    redis = None
+
+
+class CacheManager:
+    """
+    Cache clé/valeur avec TTL.
+    Utilise Redis quand une URL est fournie, un dictionnaire LRU en mémoire sinon.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, prefix: str = 'odyssee:', max_entries: int = 512):
+        """
+        Initialise le cache.
+
+        Args:
+            redis_url: URL Redis (optionnelle)
+            prefix: Préfixe ajouté à toutes les clés
+            max_entries: Nombre maximal d'entrées du cache mémoire (les moins récemment utilisées sont évincées)
+        """
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self._redis = None
+        # Clés versionnées (trip_html, trip_dict, gemini...) jamais relues une fois périmées :
+        # sans borne, le cache mémoire grossirait indéfiniment
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if redis_url and redis is not None:
+            self._redis = redis.Redis.from_url(redis_url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        """Retourne la valeur associée à la clé, ou None si absente/expirée."""
+        key = self.prefix + key
+        if self._redis is not None:
+            try:
+                return self._redis.get(key)
+            except redis.RedisError:
+                return None
+
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int = 300):
+        """Stocke une valeur pour `ttl` secondes."""
+        key = self.prefix + key
+        if self._redis is not None:
+            try:
+                self._redis.setex(key, ttl, value)
+            except redis.RedisError:
+                pass
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._local[key] = (now + ttl, value)
+            self._local.move_to_end(key)
+
+            # Purge opportuniste des entrées expirées en tête (les moins récemment utilisées)
+            while self._local:
+                oldest_key, (expires_at, _value) = next(iter(self._local.items()))
+                if expires_at >= now:
+                    break
+                del self._local[oldest_key]
+
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def delete(self, key: str):
+        """Supprime une clé du cache."""
+        key = self.prefix + key
+        if self._redis is not None:
+            try:
+                self._redis.delete(key)
+            except redis.RedisError:
+                pass
+            return
+
+        with self._lock:
+            self._local.pop(key, None)
+
+
+# ==============================================================================
+# FONCTIONS UTILITAIRES GLOBALES
+# ==============================================================================
+
+_cache_instance: Optional[CacheManager] = None
+
+
+def init_cache(redis_url: Optional[str] = None):
+    """
+    Initialise le cache global.
+    À appeler au démarrage de l'application.
+
+    Args:
+        redis_url: URL Redis (optionnelle)
+    """
+    global _cache_instance
+    _cache_instance = CacheManager(redis_url)
+
+
+def get_cache() -> CacheManager:
+    """
+    Retourne l'instance du cache (cache mémoire par défaut si non initialisé).
+
+    Returns:
+        CacheManager instance
+    """
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = CacheManager()
+    return _cache_instance
@@ -6,16 +6,70 @@ sinon toutes les données chiffrées seront perdues.
 """
 
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import base64
 import hashlib
 import json
-from typing import Optional, Dict, Any
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
+
+_log = logging.getLogger(__name__)
+
+# orjson (plus rapide, produit directement des octets) si disponible, sinon json standard
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+
+@lru_cache(maxsize=8)
+def _build_fernet(master_key: str) -> Fernet:
+    """
+    Convertit une clé maître string en objet Fernet.
+    
+    La clé doit être de 32 bytes en base64 URL-safe.
+    On utilise SHA256 pour dériver une clé de la bonne taille.
+    Mis en cache : une réinitialisation avec la même clé ne refait pas la dérivation.
+    """
+    # Dériver une clé de 32 bytes depuis la clé maître
+    key_bytes = hashlib.sha256(master_key.encode()).digest()
+    # Encoder en base64 URL-safe (format requis par Fernet)
+    fernet_key = base64.urlsafe_b64encode(key_bytes)
+    return Fernet(fernet_key)
+
+
+# Format v2 : octet de version + nonce de 12 octets + chiffré AES-GCM (tag inclus), le tout en base64 URL-safe.
+# Les jetons Fernet (format historique) commencent par l'octet 0x80 et restent déchiffrables.
+_V2_VERSION = 0x02
+_V2_NONCE_SIZE = 12
+
+
+@lru_cache(maxsize=8)
+def _build_aesgcm(master_key: str) -> AESGCM:
+    """
+    Dérive la clé AES-256-GCM du format v2 depuis la clé maître.
+    Dérivation SHA256 comme pour Fernet, avec un préfixe distinct pour ne pas réutiliser la même clé.
+    """
+    key_bytes = hashlib.sha256(b'odyssee-aesgcm-v2:' + master_key.encode()).digest()
+    return AESGCM(key_bytes)
 
 
 class CryptoManager:
     """
     Gestionnaire de chiffrement pour les données sensibles des agences.
-    Utilise Fernet (chiffrement symétrique) de la librairie cryptography.
+    Chiffre en AES-GCM (format v2, une seule passe chiffrement + authentification) ;
+    les données chiffrées avec Fernet (format historique) restent lisibles.
     """
     
     def __init__(self, master_key: str):
@@ -26,20 +80,59 @@ class CryptoManager:
             master_key: Clé maître (doit être constante en production)
         """
         # Convertir la clé maître en clé Fernet valide (32 bytes URL-safe base64)
-        self.fernet = self._create_fernet_from_key(master_key)
+        self.fernet = _build_fernet(master_key)
+        self.aesgcm = _build_aesgcm(master_key)
+    
+    def encrypt_v2(self, data: bytes) -> bytes:
+        """Chiffre des octets au format v2 (AES-GCM), retourne le jeton base64."""
+        nonce = os.urandom(_V2_NONCE_SIZE)
+        return base64.urlsafe_b64encode(bytes((_V2_VERSION,)) + nonce + self.aesgcm.encrypt(nonce, data, None))
     
-    def _create_fernet_from_key(self, master_key: str) -> Fernet:
+    def decrypt_v2(self, token: bytes) -> bytes:
         """
-        Convertit une clé maître string en objet Fernet.
+        Déchiffre un jeton base64, au format v2 ou Fernet (format historique).
         
-        La clé doit être de 32 bytes en base64 URL-safe.
-        On utilise SHA256 pour dériver une clé de la bonne taille.
+        Raises:
+            InvalidTag / InvalidToken: Si le jeton est altéré ou chiffré avec une autre clé
         """
-        # Dériver une clé de 32 bytes depuis la clé maître
-        key_bytes = hashlib.sha256(master_key.encode()).digest()
-        # Encoder en base64 URL-safe (format requis par Fernet)
-        fernet_key = base64.urlsafe_b64encode(key_bytes)
-        return Fernet(fernet_key)
+        raw = base64.urlsafe_b64decode(token)
+        if raw[:1] != bytes((_V2_VERSION,)):
+            return self.fernet.decrypt(token)
+        nonce = raw[1:1 + _V2_NONCE_SIZE]
+        return self.aesgcm.decrypt(nonce, raw[1 + _V2_NONCE_SIZE:], None)
+    
+    def encrypt_bytes(self, data: bytes) -> bytes:
+        """
+        Chiffre des octets (sans conversion de texte).
+        
+        Args:
+            data: Données à chiffrer (bytes)
+            
+        Returns:
+            Données chiffrées (bytes base64, ASCII)
+        """
+        try:
+            return self.encrypt_v2(data)
+        except Exception as e:
+            _log.exception("Erreur de chiffrement: %s", e)
+            raise
+    
+    def decrypt_bytes(self, encrypted_data: bytes) -> bytes:
+        """
+        Déchiffre des octets (sans conversion de texte).
+        
+        Args:
+            encrypted_data: Données chiffrées (bytes base64)
+            
+        Returns:
+            Données déchiffrées (bytes)
+        """
+        try:
+            return self.decrypt_v2(encrypted_data)
+        except Exception as e:
+            _log.warning("Erreur de déchiffrement: %s", e)
+            # Si le déchiffrement échoue, c'est probablement que la clé a changé
+            raise ValueError("Impossible de déchiffrer les données. La clé maître a peut-être changé.")
     
     def encrypt(self, data: str) -> str:
         """
@@ -54,12 +147,8 @@ class CryptoManager:
         if not data:
             return ''
         
-        try:
-            encrypted_bytes = self.fernet.encrypt(data.encode('utf-8'))
-            return encrypted_bytes.decode('utf-8')
-        except Exception as e:
-            print(f"❌ Erreur de chiffrement: {e}")
-            raise
+        # Le jeton base64 est de l'ASCII pur
+        return self.encrypt_bytes(data.encode('utf-8')).decode('ascii')
     
     def decrypt(self, encrypted_data: str) -> str:
         """
@@ -74,13 +163,7 @@ class CryptoManager:
         if not encrypted_data:
             return ''
         
-        try:
-            decrypted_bytes = self.fernet.decrypt(encrypted_data.encode('utf-8'))
-            return decrypted_bytes.decode('utf-8')
-        except Exception as e:
-            print(f"❌ Erreur de déchiffrement: {e}")
-            # Si le déchiffrement échoue, c'est probablement que la clé a changé
-            raise ValueError("Impossible de déchiffrer les données. La clé maître a peut-être changé.")
+        return self.decrypt_bytes(encrypted_data.encode('utf-8')).decode('utf-8')
     
     def encrypt_json(self, data: Dict[Any, Any]) -> str:
         """
@@ -92,8 +175,12 @@ class CryptoManager:
         Returns:
             JSON chiffré (string)
         """
-        json_str = json.dumps(data)
-        return self.encrypt(json_str)
+        # Configuration vide : rien à chiffrer (decrypt_json rend {} pour une chaîne vide)
+        if not data:
+            return ''
+        
+        # JSON sérialisé directement en octets : pas d'aller-retour par une chaîne
+        return self.encrypt_bytes(_json_dumps(data)).decode('ascii')
     
     def decrypt_json(self, encrypted_json: str) -> Dict[Any, Any]:
         """
@@ -105,8 +192,22 @@ class CryptoManager:
         Returns:
             Dictionnaire Python
         """
-        json_str = self.decrypt(encrypted_json)
-        return json.loads(json_str) if json_str else {}
+        if not encrypted_json:
+            return {}
+        return _json_loads(self.decrypt_bytes(encrypted_json.encode('utf-8')))
+    
+    def decrypt_many(self, encrypted_values: List[str]) -> List[str]:
+        """
+        Déchiffre plusieurs valeurs en un seul appel (valeurs vides conservées vides).
+        
+        Args:
+            encrypted_values: Liste de données chiffrées
+            
+        Returns:
+            Liste des données déchiffrées, dans le même ordre
+        """
+        decrypt = self.decrypt
+        return [decrypt(value) for value in encrypted_values]
 
 
 # ==============================================================================
@@ -126,7 +227,7 @@ def init_crypto(master_key: str):
     """
     global _crypto_manager_instance
     _crypto_manager_instance = CryptoManager(master_key)
-    print("🔐 Gestionnaire de chiffrement initialisé")
+    _log.info("Gestionnaire de chiffrement initialisé")
 
 
 def get_crypto() -> CryptoManager:
@@ -196,6 +297,58 @@ def decrypt_config(encrypted_config: str) -> Dict[str, Any]:
     return get_crypto().decrypt_json(encrypted_config)
 
 
+def decrypt_agency_bundle(agency) -> Dict[str, Any]:
+    """
+    Déchiffre en une fois tous les secrets d'une agence (clés API et configurations).
+    
+    Args:
+        agency: Agence (modèle) avec les champs *_encrypted
+        
+    Returns:
+        Dict avec 'google_api_key', 'stripe_api_key' (None si absentes),
+        'mail_config' et 'ftp_config' ({} si absentes)
+    """
+    google_api_key, stripe_api_key, mail_config, ftp_config = get_crypto().decrypt_many([
+        agency.google_api_key_encrypted or '',
+        agency.stripe_api_key_encrypted or '',
+        agency.mail_config_encrypted or '',
+        agency.ftp_config_encrypted or ''
+    ])
+    return {
+        'google_api_key': google_api_key or None,
+        'stripe_api_key': stripe_api_key or None,
+        'mail_config': _json_loads(mail_config) if mail_config else {},
+        'ftp_config': _json_loads(ftp_config) if ftp_config else {}
+    }
+
+
+# ==============================================================================
+# RECHIFFREMENT EN MASSE
+# ==============================================================================
+
+def bulk_reencrypt(old_manager: CryptoManager, new_manager: CryptoManager,
+                   encrypted_values: List[str], max_workers: Optional[int] = None) -> List[str]:
+    """
+    Rechiffre une liste de valeurs (rotation de la clé maître, ou passage des anciennes
+    valeurs Fernet au format v2 avec le même gestionnaire des deux côtés).
+    OpenSSL relâche le GIL pendant le chiffrement : les valeurs sont traitées en parallèle.
+    
+    Args:
+        old_manager: Gestionnaire capable de déchiffrer les valeurs actuelles
+        new_manager: Gestionnaire utilisé pour le nouveau chiffrement
+        encrypted_values: Valeurs chiffrées (les valeurs vides restent vides)
+        max_workers: Nombre de threads (nombre de cœurs par défaut)
+        
+    Returns:
+        Valeurs rechiffrées, dans le même ordre
+        
+    Raises:
+        ValueError: Si une valeur ne peut pas être déchiffrée avec l'ancienne clé
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        return list(executor.map(lambda value: new_manager.encrypt(old_manager.decrypt(value)), encrypted_values))
+
+
 # ==============================================================================
 # GÉNÉRATION DE CLÉ MAÎTRE
 # ==============================================================================